@@ -0,0 +1,39 @@
+import os
+
+REDIS_HOST = os.environ.get('REDIS_HOST')
+REDIS_PORT = os.environ.get('REDIS_PORT', 6379)
+
+if os.environ.get('CACHE_DISABLED', 'False') == 'True':
+    # замеры производительности без кэша (см. manage.py benchmark)
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        }
+    }
+elif REDIS_HOST:
+    # база 0 занята состоянием ETL
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': 'redis://{}:{}/1'.format(REDIS_HOST, REDIS_PORT),
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Ответы API сбрасываются при изменении контента (movies.signals),
+# таймаут лишь страхует от изменений в обход django.
+MOVIES_API_CACHE_TIMEOUT = 24 * 60 * 60
+# Ключи версий живут дольше ответов: ответ, закэшированный под старой
+# версией, истекает раньше, чем версия может вернуться к прежней.
+MOVIES_API_VERSION_TIMEOUT = 2 * MOVIES_API_CACHE_TIMEOUT
+# Клиенты и nginx перепроверяют ответ (ETag/Last-Modified) через
+# MOVIES_API_MAX_AGE секунд.
+MOVIES_API_MAX_AGE = 0
@@ -14,3 +14,58 @@ DATABASES = {
         }
     }
 }
+
+# Постоянные соединения django (CONN_MAX_AGE, с) или пул соединений на
+# процесс (utils.pg_pool, POSTGRES_POOL=True); по умолчанию - подключение
+# на каждый запрос. Сравнение: manage.py benchmark --pool off,persistent,on
+if os.environ.get('POSTGRES_POOL', 'False') == 'True':
+    DATABASES['default']['ENGINE'] = 'utils.pg_pool'
+    DATABASES['default']['OPTIONS']['connect_timeout'] = 5
+    DATABASES['default']['POOL'] = {
+        # свободные соединения, не закрываемые по простою; заранее
+        # пул не заполняется
+        'MIN_SIZE': 1,
+        'MAX_SIZE': int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 4)),
+        # секунды: срок жизни соединения, простой свободного соединения,
+        # ожидание свободного соединения и простой до проверки SELECT 1
+        'MAX_LIFETIME': 1800,
+        'MAX_IDLE': 300,
+        'TIMEOUT': 10,
+        'CHECK_INTERVAL': 5,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(
+        os.environ.get('POSTGRES_CONN_MAX_AGE', 0))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплики для чтения API: POSTGRES_REPLICA_HOSTS=host1:5432,host2:5433
+# таймауты подключения (с) и запроса (мс) к реплике
+REPLICA_CONNECT_TIMEOUT = 2
+REPLICA_STATEMENT_TIMEOUT = int(os.environ.get(
+    'POSTGRES_REPLICA_STATEMENT_TIMEOUT', 5000))
+DATABASE_REPLICAS = []
+for number, address in enumerate(
+        filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')),
+        start=1):
+    host, _, port = address.strip().partition(':')
+    alias = 'replica_{}'.format(number)
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # недоступная реплика не должна задерживать запросы к API
+        'OPTIONS': {
+            'connect_timeout': REPLICA_CONNECT_TIMEOUT,
+            'options': '{} -c statement_timeout={}'.format(
+                DATABASES['default']['OPTIONS']['options'],
+                REPLICA_STATEMENT_TIMEOUT),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['utils.db_router.ReplicaRouter']
+REPLICA_ROUTED_PATHS = ['/api/']
+# допустимое отставание реплики (с) и период проверки её состояния (с)
+REPLICA_MAX_LAG = int(os.environ.get('POSTGRES_REPLICA_MAX_LAG', 10))
+REPLICA_CHECK_INTERVAL = 5
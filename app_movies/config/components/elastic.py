@@ -0,0 +1,16 @@
+import os
+
+ELASTIC_DSL = {
+    'hosts': ['http://{}:{}'.format(
+        os.environ.get('ELASTIC_HOST', '127.0.0.1'),
+        os.environ.get('ELASTIC_PORT', 9200))],
+    'basic_auth': (
+        os.environ.get('ELASTIC_USER'),
+        os.environ.get('ELASTIC_PASSWORD')
+    )
+}
+
+# индексы заполняются ETL (postgres_to_es)
+ELASTIC_MOVIES_INDEX = 'movies'
+ELASTIC_PERSONS_INDEX = 'persons'
+ELASTIC_GENRES_INDEX = 'genres'
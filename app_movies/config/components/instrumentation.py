@@ -0,0 +1,16 @@
+import os
+
+# метрики запросов (/metrics), медленные запросы и N+1 в логе
+INSTRUMENTATION = os.environ.get('INSTRUMENTATION', 'False') == 'True'
+# заголовок Server-Timing с временем в базе и отрисовки ответа
+INSTRUMENTATION_SERVER_TIMING = os.environ.get(
+    'INSTRUMENTATION_SERVER_TIMING', 'False') == 'True'
+INSTRUMENTATION_SLOW_QUERY_MS = 100
+# столько одинаковых (с точностью до параметров) запросов за один
+# HTTP запрос считаются признаком N+1
+INSTRUMENTATION_N_PLUS_ONE = 10
+# воркеры gunicorn делят сокет и /metrics отвечает любой из них: метрики
+# всех процессов собираются через общий каталог (очищается при запуске,
+# см. entrypoint.sh); без него /metrics показывает метрики одного воркера
+INSTRUMENTATION_METRICS_DIR = os.environ.get('INSTRUMENTATION_METRICS_DIR', '')
+INSTRUMENTATION_FLUSH_INTERVAL = 1
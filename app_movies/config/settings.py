@@ -19,6 +19,9 @@ load_dotenv()
 
 include(
     'components/database.py',
+    'components/cache.py',
+    'components/elastic.py',
+    'components/instrumentation.py',
 )
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +37,9 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 DEBUG = os.environ.get('DEBUG', False) == 'True'
 
 ALLOWED_HOSTS = os.environ.get("ALLOWED_HOSTS").split(" ")
+# Django 4 сверяет заголовок Origin у POST запросов (вход в админку)
+# с адресом сайта; адреса за прокси с другим портом перечисляются здесь
+CSRF_TRUSTED_ORIGINS = os.environ.get('CSRF_TRUSTED_ORIGINS', '').split()
 
 # Application definition
 
@@ -44,12 +50,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'movies.apps.MoviesConfig',
 ]
 
 MIDDLEWARE = [
+    'utils.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'utils.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -110,8 +119,6 @@ TIME_ZONE = 'UTC'
 
 USE_I18N = True
 
-USE_L10N = True
-
 USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
@@ -126,3 +133,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MOVIES_PAGE_PAGINATE_BY = 50
+# выше этого числа строк списки админки показывают оценку вместо COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = 10000
+# варианты фильтров админки кэшируются на (с)
+ADMIN_FILTER_CACHE_TIMEOUT = 5 * 60
+# API читает денормализованную таблицу content.film_work_read вместо
+# агрегации по таблицам связей
+MOVIES_READ_MODEL = os.environ.get('MOVIES_READ_MODEL', 'True') == 'True'
+# JSON фильмов кэшируется по (id, modified) модели чтения, страницы
+# собираются из готовых фрагментов
+MOVIES_FRAGMENT_CACHE = os.environ.get('MOVIES_FRAGMENT_CACHE',
+                                       'True') == 'True'
+MOVIES_FRAGMENT_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+# асинхронные представления списка и карточки фильма, имеет смысл только
+# при запуске через config.asgi (см. entrypoint.sh)
+MOVIES_API_ASYNC = os.environ.get('MOVIES_API_ASYNC', 'False') == 'True'
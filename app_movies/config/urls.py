@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from utils.instrumentation import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('movies.api.urls')),
+    path('metrics', metrics_view),
 
 ]
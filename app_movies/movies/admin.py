@@ -1,11 +1,81 @@
+from django.conf import settings
 from django.contrib import admin
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
 
+from utils.admin_actions import action_form, add_links, remove_links
+from utils.admin_changelist import LeanChangeListMixin
+from utils.admin_inline import PaginatedInlineMixin
+from utils.admin_search import TrigramSearchMixin
+from .forms import (
+    FilmsActionForm,
+    FilmsRoleActionForm,
+    GenreActionForm,
+    PersonActionForm,
+)
 from .models import Genre, FilmWork, GenreFilmWork, Person, PersonFilmWork
 
+GENRE_CHOICES_KEY = 'admin:genre_choices'
+
+
+class GenreListFilter(admin.SimpleListFilter):
+    """
+    Фильтр по жанру через подзапрос: без JOIN и DISTINCT по связям,
+    список жанров берётся из кэша.
+    """
+    title = _('genres')
+    parameter_name = 'genre'
+
+    def lookups(self, request, model_admin):
+        return cache.get_or_set(
+            GENRE_CHOICES_KEY,
+            lambda: [(str(pk), name) for pk, name in Genre.objects.order_by(
+                'name').values_list('id', 'name')],
+            settings.ADMIN_FILTER_CACHE_TIMEOUT,
+        )
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(id__in=GenreFilmWork.objects.filter(
+            genre_id=self.value()).values('film_work_id'))
+
+
+def links_action(model_admin, request, queryset, form_class, title, apply):
+    """
+    Массовое изменение связей выбранных объектов: после подтверждения
+    формы apply(cleaned_data, pks) возвращает число изменённых связей.
+    """
+    form, response = action_form(model_admin, request, form_class, title)
+    if form is None:
+        return response
+    count = apply(form.cleaned_data, queryset.values_list('pk', flat=True))
+    model_admin.message_user(
+        request, _('Links changed: %(count)d') % {'count': count})
+
 
 @admin.register(Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(TrigramSearchMixin, admin.ModelAdmin):
     search_fields = ('name', 'description')
+    actions = ('add_to_films', 'remove_from_films')
+
+    @admin.action(description=_('Add selected genres to films'))
+    def add_to_films(self, request, queryset):
+        return links_action(
+            self, request, queryset, FilmsActionForm,
+            _('Add selected genres to films'),
+            lambda data, pks: add_links(
+                GenreFilmWork, 'genre',
+                [film.pk for film in data['film_works']], pks))
+
+    @admin.action(description=_('Remove selected genres from films'))
+    def remove_from_films(self, request, queryset):
+        return links_action(
+            self, request, queryset, FilmsActionForm,
+            _('Remove selected genres from films'),
+            lambda data, pks: remove_links(
+                GenreFilmWork, 'genre',
+                [film.pk for film in data['film_works']], pks))
 
 
 class GenreFilmWorkInline(admin.TabularInline):
@@ -14,28 +84,86 @@ class GenreFilmWorkInline(admin.TabularInline):
     autocomplete_fields = ('genre',)
 
 
-
-class PersonFilmWorkInline(admin.TabularInline):
+class PersonFilmWorkInline(PaginatedInlineMixin, admin.TabularInline):
     model = PersonFilmWork
     extra = 0
     # fk_name = 'film_work'
     fields = ('person', 'role',)
     raw_id_fields = ('person',)
-    ordering = ('person__full_name',)
+    ordering = ('person__full_name', 'id')
+    template = 'admin/movies/edit_inline/paginated_tabular.html'
+    page_param = 'cast_page'
+    search_param = 'cast_q'
+    search_field = 'person__full_name'
 
 
 @admin.register(FilmWork)
-class FilmWorkAdmin(admin.ModelAdmin):
+class FilmWorkAdmin(TrigramSearchMixin, LeanChangeListMixin,
+                    admin.ModelAdmin):
     inlines = (GenreFilmWorkInline, PersonFilmWorkInline,)
     list_display = ('title', 'type', 'creation_date', 'rating',)
-    list_filter = ('type', 'genres')
+    list_filter = ('type', GenreListFilter)
     search_fields = ('title', 'description', 'id')
+    actions = ('add_genre', 'remove_genre', 'add_person', 'remove_person')
+
+    @admin.action(description=_('Add genre to selected films'))
+    def add_genre(self, request, queryset):
+        return links_action(
+            self, request, queryset, GenreActionForm,
+            _('Add genre to selected films'),
+            lambda data, pks: add_links(
+                GenreFilmWork, 'genre', pks, [data['genre'].pk]))
+
+    @admin.action(description=_('Remove genre from selected films'))
+    def remove_genre(self, request, queryset):
+        return links_action(
+            self, request, queryset, GenreActionForm,
+            _('Remove genre from selected films'),
+            lambda data, pks: remove_links(
+                GenreFilmWork, 'genre', pks, [data['genre'].pk]))
 
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.prefetch_related('persons', 'genres')
+    @admin.action(description=_('Add person to selected films'))
+    def add_person(self, request, queryset):
+        return links_action(
+            self, request, queryset, PersonActionForm,
+            _('Add person to selected films'),
+            lambda data, pks: add_links(
+                PersonFilmWork, 'person', pks, [data['person'].pk],
+                role=data['role']))
+
+    @admin.action(description=_('Remove person from selected films'))
+    def remove_person(self, request, queryset):
+        return links_action(
+            self, request, queryset, PersonActionForm,
+            _('Remove person from selected films'),
+            lambda data, pks: remove_links(
+                PersonFilmWork, 'person', pks, [data['person'].pk],
+                role=data['role']))
 
 
 @admin.register(Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(TrigramSearchMixin, LeanChangeListMixin,
+                  admin.ModelAdmin):
+    list_display = ('full_name',)
     search_fields = ('full_name',)
+    actions = ('add_to_films', 'remove_from_films')
+
+    @admin.action(description=_('Add selected persons to films'))
+    def add_to_films(self, request, queryset):
+        return links_action(
+            self, request, queryset, FilmsRoleActionForm,
+            _('Add selected persons to films'),
+            lambda data, pks: add_links(
+                PersonFilmWork, 'person',
+                [film.pk for film in data['film_works']], pks,
+                role=data['role']))
+
+    @admin.action(description=_('Remove selected persons from films'))
+    def remove_from_films(self, request, queryset):
+        return links_action(
+            self, request, queryset, FilmsRoleActionForm,
+            _('Remove selected persons from films'),
+            lambda data, pks: remove_links(
+                PersonFilmWork, 'person',
+                [film.pk for film in data['film_works']], pks,
+                role=data['role']))
@@ -1,8 +1,18 @@
+from django.conf import settings
 from django.urls import path
 from movies.api.v1 import views
 
+if settings.MOVIES_API_ASYNC:
+    list_view = views.MoviesListAsyncApi
+    detail_view = views.MoviesDetailAsyncApi
+else:
+    list_view = views.MoviesListApi
+    detail_view = views.MoviesDetailApi
+
 urlpatterns = [
-    path('movies/', views.MoviesListApi.as_view()),
-    path('movies/<uuid:pk>/', views.MoviesDetailApi.as_view())
+    path('movies/', list_view.as_view()),
+    path('movies/search/', views.MoviesSearchApi.as_view()),
+    path('movies/export/', views.MoviesExportApi.as_view()),
+    path('movies/<uuid:pk>/', detail_view.as_view())
 
 ]
@@ -1,16 +1,42 @@
+from math import ceil
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import BadRequest, ObjectDoesNotExist
+from django.db import router
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_datetime
+from django.views import View
 from django.views.generic.detail import BaseDetailView
-from django.views.generic.list import BaseListView
+from django.views.generic.list import BaseListView, MultipleObjectMixin
+from elasticsearch import BadRequestError as ElasticBadRequestError
+from elasticsearch import ConnectionError as ElasticConnectionError
+from elasticsearch import NotFoundError as ElasticNotFoundError
 
+from config.settings import MOVIES_API_ASYNC, MOVIES_PAGE_PAGINATE_BY
 from movies.models import FilmWork
+from utils.api_cache import (ApiCacheMixin, AsyncApiCacheMixin,
+                             afilm_version, alist_version, film_version,
+                             list_version)
+from utils.cursor_pagination import (CursorPaginator, acached_count,
+                                     cached_count, estimated_count)
+from utils.elastic import SORTS, search_movies
+from utils.export import (agzip_stream, andjson_stream, gzip_stream,
+                          ndjson_stream)
 from utils.model_mixin import MoviesApiMixin
 
 
-class MoviesListApi(MoviesApiMixin, BaseListView):
+class MoviesListApi(ApiCacheMixin, MoviesApiMixin, BaseListView):
     model = FilmWork
     http_method_names = ['get']
 
+    def get_version(self):
+        return list_version()
+
     def get_context_data(self, *, object_list=None, **kwargs):
         queryset = self.get_queryset()
+        if 'cursor' in self.request.GET:
+            return self.get_cursor_context_data(queryset)
+
         paginator, page, queryset, is_paginated = self.paginate_queryset(
             queryset,
             self.paginate_by
@@ -26,9 +52,175 @@ class MoviesListApi(MoviesApiMixin, BaseListView):
             'results': list(queryset)
         }
 
+    def get_cursor_context_data(self, queryset):
+        """
+        Постраничный вывод по курсору: ?cursor= для первой страницы,
+        далее значения next/prev из ответа. Количество фильмов считается
+        только по запросу: ?count=estimate (статистика postgres) или
+        ?count=exact (кэшируется).
+        """
+        paginator = CursorPaginator(queryset, self.paginate_by)
+        page = paginator.page(self.request.GET.get('cursor'))
+
+        count = None
+        count_mode = self.request.GET.get('count')
+        if count_mode == 'estimate':
+            count = estimated_count(self.model)
+        elif count_mode == 'exact':
+            count = cached_count(self.model.objects.all(), 'movies:count')
+        return {'count': count, **page}
 
-class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
+
+class MoviesDetailApi(ApiCacheMixin, MoviesApiMixin, BaseDetailView):
+
+    def get_version(self):
+        return film_version(self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         return context.get('object', {})
+
+
+class MoviesListAsyncApi(AsyncApiCacheMixin, MoviesApiMixin,
+                         MultipleObjectMixin, View):
+    """
+    Асинхронная версия MoviesListApi для запуска через config.asgi:
+    пока идёт запрос к postgres, воркер обслуживает другие соединения.
+    """
+
+    async def get_version(self):
+        return await alist_version()
+
+    async def aget_response(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if 'cursor' in request.GET:
+            context = await self.aget_cursor_context_data(queryset)
+        else:
+            context = await self.aget_page_context_data(queryset)
+        return await sync_to_async(self.render_to_response)(context)
+
+    async def aget_page_context_data(self, queryset):
+        count = await queryset.acount()
+        num_pages = max(ceil(count / self.paginate_by), 1)
+        page = self.request.GET.get('page') or 1
+        try:
+            page = num_pages if page == 'last' else int(page)
+        except ValueError:
+            raise Http404('Page is not “last”, nor can it be converted '
+                          'to an int.')
+        if not 1 <= page <= num_pages:
+            raise Http404('Invalid page ({})'.format(page))
+
+        offset = (page - 1) * self.paginate_by
+        results = [row async for row in
+                   queryset[offset:offset + self.paginate_by]]
+        return {
+            'count': count,
+            'total_pages': num_pages,
+            'prev': page - 1 if page > 1 else None,
+            'next': page + 1 if page < num_pages else None,
+            'results': results,
+        }
+
+    async def aget_cursor_context_data(self, queryset):
+        paginator = CursorPaginator(queryset, self.paginate_by)
+        page = await paginator.apage(self.request.GET.get('cursor'))
+
+        count = None
+        count_mode = self.request.GET.get('count')
+        if count_mode == 'estimate':
+            count = await sync_to_async(estimated_count)(self.model)
+        elif count_mode == 'exact':
+            count = await acached_count(self.model.objects.all(),
+                                        'movies:count')
+        return {'count': count, **page}
+
+
+class MoviesDetailAsyncApi(AsyncApiCacheMixin, MoviesApiMixin,
+                           MultipleObjectMixin, View):
+
+    async def get_version(self):
+        return await afilm_version(self.kwargs['pk'])
+
+    async def aget_response(self, request, *args, **kwargs):
+        try:
+            film = await self.get_queryset().filter(
+                pk=self.kwargs['pk']).aget()
+        except ObjectDoesNotExist:
+            raise Http404('No film found matching the query')
+        return await sync_to_async(self.render_to_response)(film)
+
+
+class MoviesExportApi(MoviesApiMixin, BaseListView):
+    """
+    Выгрузка всего каталога в NDJSON одним потоковым ответом. Строки
+    читаются серверным курсором, память не зависит от размера каталога.
+    ?updated_since=<ISO дата> - только изменённые с этого момента,
+    ?compress=gzip - сжатый файл, ?fields=/?expand= как в списке.
+    """
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset().values(*self.get_fields(), 'modified')
+        updated_since = request.GET.get('updated_since')
+        if updated_since:
+            since = parse_datetime(updated_since)
+            if since is None:
+                raise BadRequest('invalid updated_since')
+            queryset = queryset.filter(modified__gte=since)
+
+        # поток читается после ReplicaRoutingMiddleware, поэтому база
+        # выбирается сейчас, пока действует маршрутизация запроса
+        queryset = queryset.using(router.db_for_read(self.model))
+        if MOVIES_API_ASYNC:
+            stream = andjson_stream(
+                queryset.aiterator(chunk_size=self.chunk_size))
+            compress = agzip_stream
+        else:
+            stream = ndjson_stream(
+                queryset.iterator(chunk_size=self.chunk_size))
+            compress = gzip_stream
+        if request.GET.get('compress') == 'gzip':
+            response = StreamingHttpResponse(compress(stream),
+                                             content_type='application/gzip')
+            filename = 'movies.ndjson.gz'
+        else:
+            response = StreamingHttpResponse(
+                stream, content_type='application/x-ndjson')
+            filename = 'movies.ndjson'
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+            filename)
+        # nginx не должен буферизовать поток целиком
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class MoviesSearchApi(View):
+    """
+    Полнотекстовый поиск и фильтрация по индексам elasticsearch:
+    ?query=, ?genre=<id>, ?person=<id> (можно несколько),
+    ?sort=relevance|rating|-rating, ?after=<next из прошлого ответа>.
+    """
+    http_method_names = ['get']
+    paginate_by = MOVIES_PAGE_PAGINATE_BY
+
+    def get(self, request, *args, **kwargs):
+        sort = request.GET.get('sort', 'relevance')
+        if sort not in SORTS:
+            raise BadRequest('unknown sort')
+        try:
+            context = search_movies(
+                query=request.GET.get('query'),
+                genres=request.GET.getlist('genre'),
+                persons=request.GET.getlist('person'),
+                sort=sort,
+                after=request.GET.get('after'),
+                size=self.paginate_by,
+            )
+        except (ElasticConnectionError, ElasticNotFoundError):
+            # индекс ещё не создан ETL - поиск недоступен
+            return JsonResponse({'error': 'search is unavailable'},
+                                status=503)
+        except ElasticBadRequestError:
+            raise BadRequest('invalid search parameters')
+        return JsonResponse(context)
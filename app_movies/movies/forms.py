@@ -0,0 +1,44 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import (
+    AutocompleteSelect,
+    AutocompleteSelectMultiple,
+)
+from django.utils.translation import gettext_lazy as _
+
+from .models import (
+    FilmWork,
+    Genre,
+    GenreFilmWork,
+    Person,
+    PersonFilmWork,
+    PersonRole,
+)
+
+
+class GenreActionForm(forms.Form):
+    genre = forms.ModelChoiceField(Genre.objects.order_by('name'),
+                                   label=_('genre'))
+
+
+class PersonActionForm(forms.Form):
+    person = forms.ModelChoiceField(
+        Person.objects.all(),
+        label=_('person'),
+        widget=AutocompleteSelect(
+            PersonFilmWork._meta.get_field('person'), admin.site),
+    )
+    role = forms.ChoiceField(choices=PersonRole.choices, label=_('role'))
+
+
+class FilmsActionForm(forms.Form):
+    film_works = forms.ModelMultipleChoiceField(
+        FilmWork.objects.all(),
+        label=_('film productions'),
+        widget=AutocompleteSelectMultiple(
+            GenreFilmWork._meta.get_field('film_work'), admin.site),
+    )
+
+
+class FilmsRoleActionForm(FilmsActionForm):
+    role = forms.ChoiceField(choices=PersonRole.choices, label=_('role'))
@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.benchmark import (
+    CONNECTION_MODES,
+    admin_cookie,
+    compare,
+    git_commit,
+    local_server,
+    prepare_database,
+    run_suite,
+    save_results,
+    scale_paths,
+    seed,
+)
+from utils.loadtest import format_report
+
+
+class Command(BaseCommand):
+    help = ('Замеры API и админки: для каждого размера каталога база '
+            'test_<POSTGRES_DB> заполняется синтетическими данными, '
+            'запускается локальный gunicorn и нагружается каждый адрес. '
+            'Результаты сохраняются в JSON для сравнения между коммитами')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='10000,100000',
+                            help='число фильмов через запятую')
+        parser.add_argument('--cast', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='секунд нагрузки на каждый адрес')
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--asgi', action='store_true',
+                            help='запуск через config.asgi')
+        parser.add_argument('--cached', action='store_true',
+                            help='с кэшем ответов API, по умолчанию без')
+        parser.add_argument('--pool', default='off',
+                            help='соединения с базой через запятую: off - '
+                                 'на каждый запрос, persistent - '
+                                 'CONN_MAX_AGE, on - пул; режимы '
+                                 'сравниваются с первым')
+        parser.add_argument('--output', default='benchmarks')
+        parser.add_argument('--compare', help='прошлый JSON с результатами')
+
+    def handle(self, *args, **options):
+        database = prepare_database()
+        cookie = admin_cookie()
+        results = {
+            'commit': git_commit(),
+            'options': {key: options[key] for key in (
+                'cast', 'concurrency', 'duration', 'workers', 'asgi',
+                'cached', 'pool')},
+            'scales': {},
+        }
+        modes = options['pool'].split(',')
+        unknown = set(modes) - set(CONNECTION_MODES)
+        if unknown:
+            raise CommandError('неизвестный режим --pool: {}'.format(
+                ', '.join(sorted(unknown))))
+        for films in [int(scale) for scale in options['scales'].split(',')]:
+            seed(films, max(films * 3 // 10, 1), options['cast'],
+                 log=self.stdout.write)
+            paths = scale_paths(films)
+            reports = {}
+            for mode in modes:
+                with local_server(database, workers=options['workers'],
+                                  asgi=options['asgi'],
+                                  cached=options['cached'],
+                                  connections=mode) as base_url:
+                    reports[mode] = run_suite(base_url, paths, cookie,
+                                              options['concurrency'],
+                                              options['duration'])
+                # ключ режима 'off' совпадает с прежними результатами
+                scale = str(films) if mode == 'off' else '{}:{}'.format(
+                    films, mode)
+                results['scales'][scale] = reports[mode]
+                self.stdout.write('{} films, connections {}'.format(
+                    films, mode))
+                self.stdout.write(format_report(reports[mode]))
+            for mode in modes[1:]:
+                self.stdout.write('{} relative to {}'.format(mode, modes[0]))
+                self.stdout.write(compare(
+                    {'scales': {str(films): reports[modes[0]]}},
+                    {'scales': {str(films): reports[mode]}}))
+
+        path = save_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS('saved {}'.format(path)))
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.stdout.write(compare(json.load(file), results))
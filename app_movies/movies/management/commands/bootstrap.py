@@ -0,0 +1,29 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from utils.bootstrap import Bootstrap
+
+
+class Command(BaseCommand):
+    help = ('Идемпотентная подготовка при старте контейнера: миграции, '
+            'переводы, статика, суперпользователь и фикстуры выполняются, '
+            'только если ещё не применены')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', action='append', default=[],
+                            help='json фикстура, загружаются только '
+                                 'отсутствующие объекты')
+
+    def handle(self, *args, **options):
+        bootstrap = Bootstrap(log=self.stdout.write)
+        bootstrap.migrate()
+        bootstrap.createcachetable()
+        bootstrap.compilemessages()
+        bootstrap.collectstatic()
+        username = os.environ.get('DJANGO_SUPERUSER_USERNAME')
+        if username:
+            bootstrap.createsuperuser(
+                username, os.environ.get('DJANGO_SUPERUSER_EMAIL'))
+        for path in options['fixture']:
+            bootstrap.load_fixture(path)
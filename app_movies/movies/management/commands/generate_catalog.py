@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from utils.catalog_generator import CatalogGenerator
+
+
+class Command(BaseCommand):
+    help = ('Синтетический каталог в CSV для нагрузочных тестов, '
+            'загружается командой import_catalog')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='каталог для CSV файлов')
+        parser.add_argument('--films', type=int, default=100000)
+        parser.add_argument('--persons', type=int, default=30000)
+        parser.add_argument('--cast', type=int, default=10,
+                            help='средний размер съёмочной группы фильма')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = CatalogGenerator(options['films'], options['persons'],
+                                     cast_per_film=options['cast'],
+                                     seed=options['seed'])
+        counts = generator.write(options['output'])
+        for table, count in counts.items():
+            self.stdout.write('{}: {}'.format(table, count))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.bulk_import import CatalogImporter, IMPORT_MODELS, table_name
+
+
+class Command(BaseCommand):
+    help = ('Массовая загрузка каталога через COPY. Каталог содержит файлы '
+            '<таблица>.csv (с заголовком) или <таблица>.ndjson для таблиц: '
+            + ', '.join(table_name(model) for model in IMPORT_MODELS))
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='каталог с файлами')
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help='строк в одной транзакции')
+        parser.add_argument('--drop-indexes', action='store_true',
+                            help='удалить неуникальные индексы на время '
+                                 'загрузки и построить их заново')
+        parser.add_argument('--offline', action='store_true',
+                            help='отключить триггеры на время загрузки и '
+                                 'пересчитать модель чтения в конце; '
+                                 'таблицы блокируются, только без '
+                                 'параллельных правок')
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(batch_size=options['batch_size'],
+                                   drop_indexes=options['drop_indexes'],
+                                   offline=options['offline'],
+                                   log=self.stdout.write)
+        counts = importer.run(options['source'])
+        if not counts:
+            raise CommandError('нет файлов для загрузки в {}'.format(
+                options['source']))
+        self.stdout.write(self.style.SUCCESS('загружено строк: {}'.format(
+            sum(counts.values()))))
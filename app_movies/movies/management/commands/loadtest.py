@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from utils.loadtest import format_report, run_load
+
+DEFAULT_PATHS = (
+    '/api/v1/movies/',
+    '/api/v1/movies/?page=2',
+    '/api/v1/movies/?cursor=',
+)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест API фильмов. Несколько --url позволяют '
+            'сравнить, например, запуск через config.wsgi и config.asgi')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True,
+                            help='адрес запущенного сервера')
+        parser.add_argument('--path', action='append',
+                            help='путь запроса, по умолчанию список фильмов')
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--duration', type=float, default=30)
+
+    def handle(self, *args, **options):
+        for url in options['url']:
+            report = run_load(url, options['path'] or DEFAULT_PATHS,
+                              concurrency=options['concurrency'],
+                              duration=options['duration'])
+            self.stdout.write('{} (concurrency {})'.format(
+                url, options['concurrency']))
+            self.stdout.write(format_report(report))
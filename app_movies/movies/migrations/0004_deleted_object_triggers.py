@@ -0,0 +1,66 @@
+from django.db import migrations
+
+# Удаления в content.* записываются в журнал content.deleted_object,
+# откуда их забирает ETL и удаляет документы в elasticsearch.
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS content.deleted_object
+(
+    id           bigserial PRIMARY KEY,
+    table_name   TEXT NOT NULL,
+    object_id    uuid NOT NULL,
+    film_work_id uuid,
+    related_id   uuid,
+    role         TEXT,
+    deleted      timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE FUNCTION content.log_deleted_object() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'person_film_work' THEN
+        INSERT INTO content.deleted_object
+            (table_name, object_id, film_work_id, related_id, role)
+        VALUES (TG_TABLE_NAME, OLD.id, OLD.film_work_id, OLD.person_id,
+                OLD.role::text);
+    ELSIF TG_TABLE_NAME = 'genre_film_work' THEN
+        INSERT INTO content.deleted_object
+            (table_name, object_id, film_work_id, related_id)
+        VALUES (TG_TABLE_NAME, OLD.id, OLD.film_work_id, OLD.genre_id);
+    ELSE
+        INSERT INTO content.deleted_object (table_name, object_id)
+        VALUES (TG_TABLE_NAME, OLD.id);
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TABLES = ('film_work', 'person', 'genre', 'person_film_work',
+          'genre_film_work')
+
+CREATE_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS {table}_deleted ON content.{table};
+CREATE TRIGGER {table}_deleted AFTER DELETE ON content.{table}
+    FOR EACH ROW EXECUTE PROCEDURE content.log_deleted_object();
+"""
+
+DROP_TRIGGER_SQL = "DROP TRIGGER IF EXISTS {table}_deleted ON content.{table};"
+
+DROP_SQL = """
+DROP FUNCTION IF EXISTS content.log_deleted_object();
+DROP TABLE IF EXISTS content.deleted_object;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_add_related_name_to_field_persons'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ] + [
+        migrations.RunSQL(CREATE_TRIGGER_SQL.format(table=table),
+                          DROP_TRIGGER_SQL.format(table=table))
+        for table in TABLES
+    ]
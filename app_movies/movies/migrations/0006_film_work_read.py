@@ -0,0 +1,202 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+# Денормализованная модель чтения для API: одна строка на фильм с
+# массивами жанров и персон по ролям. Поддерживается триггерами уровня
+# оператора, поэтому массовые изменения пересчитываются одним запросом.
+CREATE_SQL = """
+CREATE TABLE IF NOT EXISTS content.film_work_read
+(
+    id            uuid PRIMARY KEY,
+    title         TEXT NOT NULL,
+    description   TEXT,
+    creation_date DATE,
+    rating        FLOAT,
+    type          TEXT,
+    genres        TEXT[] NOT NULL DEFAULT '{}',
+    actors        TEXT[] NOT NULL DEFAULT '{}',
+    directors     TEXT[] NOT NULL DEFAULT '{}',
+    writers       TEXT[] NOT NULL DEFAULT '{}',
+    modified      timestamp with time zone
+);
+
+CREATE INDEX IF NOT EXISTS film_work_read_title_id_idx
+    ON content.film_work_read (title, id);
+
+-- NULL пересчитывает все фильмы
+CREATE OR REPLACE FUNCTION content.refresh_film_work_read(film_ids uuid[])
+    RETURNS void AS $$
+BEGIN
+    DELETE FROM content.film_work_read r
+    WHERE (film_ids IS NULL OR r.id = ANY (film_ids))
+      AND NOT EXISTS (SELECT 1 FROM content.film_work fw WHERE fw.id = r.id);
+
+    INSERT INTO content.film_work_read
+        (id, title, description, creation_date, rating, type,
+         genres, actors, directors, writers, modified)
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating,
+           fw.type::text,
+           coalesce((SELECT array_agg(DISTINCT g.name)
+                     FROM content.genre_film_work gfw
+                     JOIN content.genre g ON g.id = gfw.genre_id
+                     WHERE gfw.film_work_id = fw.id), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'actor'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'director'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'producer'), '{}'),
+           fw.modified
+    FROM content.film_work fw
+    WHERE film_ids IS NULL OR fw.id = ANY (film_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        creation_date = EXCLUDED.creation_date,
+        rating = EXCLUDED.rating,
+        type = EXCLUDED.type,
+        genres = EXCLUDED.genres,
+        actors = EXCLUDED.actors,
+        directors = EXCLUDED.directors,
+        writers = EXCLUDED.writers,
+        modified = EXCLUDED.modified;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_work_read_films() RETURNS trigger AS $$
+BEGIN
+    PERFORM content.refresh_film_work_read(
+        ARRAY(SELECT id FROM changed_rows));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_work_read_links() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM content.refresh_film_work_read(ARRAY(
+            SELECT film_work_id FROM changed_rows
+            UNION
+            SELECT film_work_id FROM old_rows));
+    ELSE
+        PERFORM content.refresh_film_work_read(
+            ARRAY(SELECT DISTINCT film_work_id FROM changed_rows));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_work_read_persons() RETURNS trigger AS $$
+BEGIN
+    PERFORM content.refresh_film_work_read(ARRAY(
+        SELECT DISTINCT pfw.film_work_id
+        FROM changed_rows c
+        JOIN old_rows o ON o.id = c.id
+        JOIN content.person_film_work pfw ON pfw.person_id = c.id
+        WHERE o.full_name IS DISTINCT FROM c.full_name));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION content.film_work_read_genres() RETURNS trigger AS $$
+BEGIN
+    PERFORM content.refresh_film_work_read(ARRAY(
+        SELECT DISTINCT gfw.film_work_id
+        FROM changed_rows c
+        JOIN old_rows o ON o.id = c.id
+        JOIN content.genre_film_work gfw ON gfw.genre_id = c.id
+        WHERE o.name IS DISTINCT FROM c.name));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# (таблица, функция, события); на UPDATE доступны и старые строки
+TRIGGERS = (
+    ('film_work', 'film_work_read_films', ('INSERT', 'UPDATE', 'DELETE')),
+    ('genre_film_work', 'film_work_read_links', ('INSERT', 'UPDATE', 'DELETE')),
+    ('person_film_work', 'film_work_read_links', ('INSERT', 'UPDATE', 'DELETE')),
+    ('person', 'film_work_read_persons', ('UPDATE',)),
+    ('genre', 'film_work_read_genres', ('UPDATE',)),
+)
+
+REFERENCING = {
+    'INSERT': 'NEW TABLE AS changed_rows',
+    'UPDATE': 'OLD TABLE AS old_rows NEW TABLE AS changed_rows',
+    'DELETE': 'OLD TABLE AS changed_rows',
+}
+
+CREATE_TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS {name} ON content.{table};
+CREATE TRIGGER {name} AFTER {event} ON content.{table}
+    REFERENCING {referencing}
+    FOR EACH STATEMENT EXECUTE PROCEDURE content.{function}();
+"""
+
+DROP_TRIGGER_SQL = "DROP TRIGGER IF EXISTS {name} ON content.{table};"
+
+DROP_SQL = """
+DROP FUNCTION IF EXISTS content.film_work_read_genres();
+DROP FUNCTION IF EXISTS content.film_work_read_persons();
+DROP FUNCTION IF EXISTS content.film_work_read_links();
+DROP FUNCTION IF EXISTS content.film_work_read_films();
+DROP FUNCTION IF EXISTS content.refresh_film_work_read(uuid[]);
+DROP TABLE IF EXISTS content.film_work_read;
+"""
+
+
+def trigger_operations():
+    for table, function, events in TRIGGERS:
+        for event in events:
+            name = '{}_read_{}'.format(table, event.lower())
+            yield migrations.RunSQL(
+                CREATE_TRIGGER_SQL.format(name=name, table=table,
+                                          event=event, function=function,
+                                          referencing=REFERENCING[event]),
+                DROP_TRIGGER_SQL.format(name=name, table=table),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_film_work_title_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmWorkRead',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('title', models.TextField()),
+                ('description', models.TextField(null=True)),
+                ('creation_date', models.DateField(null=True)),
+                ('rating', models.FloatField(null=True)),
+                ('type', models.TextField(null=True)),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), size=None)),
+                ('modified', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'content"."film_work_read',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+        *trigger_operations(),
+        migrations.RunSQL(
+            'SELECT content.refresh_film_work_read(NULL);',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,124 @@
+from django.db import migrations
+
+UPDATE_SQL = """
+-- modified строки меняется только при изменении её содержимого, в том
+-- числе при переименовании персоны или жанра; NULL пересчитывает все фильмы
+CREATE OR REPLACE FUNCTION content.refresh_film_work_read(film_ids uuid[])
+    RETURNS void AS $$
+BEGIN
+    DELETE FROM content.film_work_read r
+    WHERE (film_ids IS NULL OR r.id = ANY (film_ids))
+      AND NOT EXISTS (SELECT 1 FROM content.film_work fw WHERE fw.id = r.id);
+
+    INSERT INTO content.film_work_read
+        (id, title, description, creation_date, rating, type,
+         genres, actors, directors, writers, modified)
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating,
+           fw.type::text,
+           coalesce((SELECT array_agg(DISTINCT g.name)
+                     FROM content.genre_film_work gfw
+                     JOIN content.genre g ON g.id = gfw.genre_id
+                     WHERE gfw.film_work_id = fw.id), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'actor'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'director'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'producer'), '{}'),
+           fw.modified
+    FROM content.film_work fw
+    WHERE film_ids IS NULL OR fw.id = ANY (film_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        creation_date = EXCLUDED.creation_date,
+        rating = EXCLUDED.rating,
+        type = EXCLUDED.type,
+        genres = EXCLUDED.genres,
+        actors = EXCLUDED.actors,
+        directors = EXCLUDED.directors,
+        writers = EXCLUDED.writers,
+        modified = now()
+    WHERE (film_work_read.title, film_work_read.description,
+           film_work_read.creation_date, film_work_read.rating,
+           film_work_read.type, film_work_read.genres,
+           film_work_read.actors, film_work_read.directors,
+           film_work_read.writers)
+          IS DISTINCT FROM
+          (EXCLUDED.title, EXCLUDED.description, EXCLUDED.creation_date,
+           EXCLUDED.rating, EXCLUDED.type, EXCLUDED.genres,
+           EXCLUDED.actors, EXCLUDED.directors, EXCLUDED.writers);
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+REVERT_SQL = """
+-- NULL пересчитывает все фильмы
+CREATE OR REPLACE FUNCTION content.refresh_film_work_read(film_ids uuid[])
+    RETURNS void AS $$
+BEGIN
+    DELETE FROM content.film_work_read r
+    WHERE (film_ids IS NULL OR r.id = ANY (film_ids))
+      AND NOT EXISTS (SELECT 1 FROM content.film_work fw WHERE fw.id = r.id);
+
+    INSERT INTO content.film_work_read
+        (id, title, description, creation_date, rating, type,
+         genres, actors, directors, writers, modified)
+    SELECT fw.id, fw.title, fw.description, fw.creation_date, fw.rating,
+           fw.type::text,
+           coalesce((SELECT array_agg(DISTINCT g.name)
+                     FROM content.genre_film_work gfw
+                     JOIN content.genre g ON g.id = gfw.genre_id
+                     WHERE gfw.film_work_id = fw.id), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'actor'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'director'), '{}'),
+           coalesce((SELECT array_agg(DISTINCT p.full_name)
+                     FROM content.person_film_work pfw
+                     JOIN content.person p ON p.id = pfw.person_id
+                     WHERE pfw.film_work_id = fw.id
+                       AND pfw.role::text = 'producer'), '{}'),
+           fw.modified
+    FROM content.film_work fw
+    WHERE film_ids IS NULL OR fw.id = ANY (film_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title,
+        description = EXCLUDED.description,
+        creation_date = EXCLUDED.creation_date,
+        rating = EXCLUDED.rating,
+        type = EXCLUDED.type,
+        genres = EXCLUDED.genres,
+        actors = EXCLUDED.actors,
+        directors = EXCLUDED.directors,
+        writers = EXCLUDED.writers,
+        modified = EXCLUDED.modified;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_film_work_read'),
+    ]
+
+    operations = [
+        migrations.RunSQL(UPDATE_SQL, REVERT_SQL),
+    ]
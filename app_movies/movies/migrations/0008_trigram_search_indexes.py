@@ -0,0 +1,47 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    TrigramExtension,
+)
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # индексы строятся CONCURRENTLY, без блокировки записи
+    atomic = False
+
+    dependencies = [
+        ('movies', '0007_film_work_read_modified'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=GinIndex(fields=['title'], name='film_work_title_trgm_idx',
+                           opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='filmwork',
+            index=GinIndex(fields=['description'],
+                           name='film_work_description_trgm_idx',
+                           opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='person',
+            index=GinIndex(fields=['full_name'],
+                           name='person_full_name_trgm_idx',
+                           opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='genre',
+            index=GinIndex(fields=['name'], name='genre_name_trgm_idx',
+                           opclasses=['gin_trgm_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='genre',
+            index=GinIndex(fields=['description'],
+                           name='genre_description_trgm_idx',
+                           opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,5 +1,7 @@
 import uuid
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -28,6 +30,13 @@ class Genre(TimeStampedMixin, UUIDMixin):
         db_table = "content\".\"genre"
         verbose_name = _('genre')
         verbose_name_plural = _('genres')
+        indexes = [
+            # поиск в админке и автодополнение (ILIKE '%...%')
+            GinIndex(fields=['name'], name='genre_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['description'], name='genre_description_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
@@ -74,6 +83,17 @@ class FilmWork(TimeStampedMixin, UUIDMixin):
         db_table = "content\".\"film_work"
         verbose_name = _('film production')
         verbose_name_plural = _('film productions')
+        indexes = [
+            # постраничный вывод API по курсору (title, id)
+            models.Index(fields=['title', 'id'],
+                         name='film_work_title_id_idx'),
+            # поиск в админке (ILIKE '%...%')
+            GinIndex(fields=['title'], name='film_work_title_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['description'],
+                     name='film_work_description_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.title
@@ -107,6 +127,11 @@ class Person(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"person"
         verbose_name = _('person')
         verbose_name_plural = _('persons')
+        indexes = [
+            # поиск в админке и выбор персоны (ILIKE '%...%')
+            GinIndex(fields=['full_name'], name='person_full_name_trgm_idx',
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.full_name
@@ -138,4 +163,26 @@ class PersonFilmWork(UUIDMixin):
                 fields=['film_work_id', 'person', 'role'],
                 name='unique_film_work_person_role_idx',
             )
-        ]
\ No newline at end of file
+        ]
+
+
+class FilmWorkRead(models.Model):
+    """
+    Денормализованная модель чтения для API, таблица поддерживается
+    триггерами (см. миграцию 0006_film_work_read).
+    """
+    id = models.UUIDField(primary_key=True)
+    title = models.TextField()
+    description = models.TextField(null=True)
+    creation_date = models.DateField(null=True)
+    rating = models.FloatField(null=True)
+    type = models.TextField(null=True)
+    genres = ArrayField(models.TextField())
+    actors = ArrayField(models.TextField())
+    directors = ArrayField(models.TextField())
+    writers = ArrayField(models.TextField())
+    modified = models.DateTimeField(null=True)
+
+    class Meta:
+        managed = False
+        db_table = "content\".\"film_work_read"
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from utils.api_cache import invalidate_films
+from .admin import GENRE_CHOICES_KEY
+from .models import FilmWork, Genre, GenreFilmWork, Person, PersonFilmWork
+
+
+def on_commit(func, *args, using=None):
+    # до фиксации транзакции параллельный запрос закэшировал бы старые
+    # данные уже под новой версией
+    transaction.on_commit(lambda: func(*args), using=using)
+
+
+@receiver([post_save, post_delete], sender=FilmWork)
+def film_work_changed(sender, instance, using, **kwargs):
+    on_commit(invalidate_films, [instance.pk], using=using)
+
+
+@receiver([post_save, post_delete], sender=PersonFilmWork)
+@receiver([post_save, post_delete], sender=GenreFilmWork)
+def film_work_link_changed(sender, instance, using, **kwargs):
+    on_commit(invalidate_films, [instance.film_work_id], using=using)
+
+
+@receiver(post_save, sender=Person)
+def person_changed(sender, instance, using, **kwargs):
+    on_commit(invalidate_films, list(PersonFilmWork.objects.filter(
+        person_id=instance.pk).values_list('film_work_id', flat=True)),
+        using=using)
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, using, **kwargs):
+    on_commit(cache.delete, GENRE_CHOICES_KEY, using=using)
+
+
+@receiver(post_save, sender=Genre)
+def genre_changed(sender, instance, using, **kwargs):
+    on_commit(cache.delete, GENRE_CHOICES_KEY, using=using)
+    on_commit(invalidate_films, list(GenreFilmWork.objects.filter(
+        genre_id=instance.pk).values_list('film_work_id', flat=True)),
+        using=using)
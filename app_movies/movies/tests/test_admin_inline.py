@@ -0,0 +1,37 @@
+import uuid
+
+from django.contrib import admin
+from django.test import RequestFactory, SimpleTestCase
+
+from movies.admin import PersonFilmWorkInline
+from movies.models import FilmWork, Person, PersonFilmWork
+
+
+class SuperUser:
+    is_active = is_staff = is_superuser = True
+
+    def has_perm(self, perm, obj=None):
+        return True
+
+
+class CastInlineTest(SimpleTestCase):
+
+    def test_person_labels_without_queries(self):
+        film = FilmWork(id=uuid.uuid4(), title='Фильм')
+        cast = [PersonFilmWork(id=uuid.uuid4(), film_work=film, role='actor',
+                               person=Person(id=uuid.uuid4(),
+                                             full_name='Актёр {}'.format(n)))
+                for n in range(3)]
+        request = RequestFactory().get('/')
+        request.user = SuperUser()
+        inline = PersonFilmWorkInline(FilmWork, admin.site)
+        formset_class = inline.get_formset(request, film)
+        self.assertEqual(formset_class.related_fields, ('person',))
+        # страница уже загружена: любой запрос к базе здесь - ошибка теста
+        formset_class._page = cast
+
+        formset = formset_class(instance=film)
+        for form, link in zip(formset.initial_forms, cast):
+            html = str(form['person'])
+            self.assertIn(link.person.full_name, html)
+            self.assertIn(str(link.person.pk), html)
@@ -0,0 +1,41 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.test import RequestFactory, SimpleTestCase
+
+from movies.admin import PersonAdmin
+from movies.models import Person
+
+
+class OrderedPersonAdmin(PersonAdmin):
+    # сортировка админки раньше вытесняла сортировку по похожести
+    ordering = ('full_name',)
+
+
+class SuperUser:
+    is_active = is_staff = is_superuser = True
+
+    def has_perm(self, perm, obj=None):
+        return True
+
+
+@mock.patch.object(ChangeList, 'get_results')
+class SimilarityOrderingTest(SimpleTestCase):
+
+    def ordering(self, **params):
+        request = RequestFactory().get('/admin/movies/person/', params)
+        request.user = SuperUser()
+        model_admin = OrderedPersonAdmin(Person, admin.site)
+        changelist = model_admin.get_changelist_instance(request)
+        return changelist.queryset.query.order_by
+
+    def test_search_orders_by_similarity(self, get_results):
+        self.assertEqual(self.ordering(q='star'),
+                         ('-search_similarity', '-pk'))
+
+    def test_column_ordering_wins(self, get_results):
+        self.assertEqual(self.ordering(q='star', o='1')[0], 'full_name')
+
+    def test_without_search(self, get_results):
+        self.assertEqual(self.ordering()[0], 'full_name')
@@ -0,0 +1,46 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.http import http_date
+from django.views import View
+
+from utils.api_cache import ApiCacheMixin
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class ContentView(View):
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(self.content, content_type='application/json')
+
+
+class CachedView(ApiCacheMixin, ContentView):
+    version = 1000.2
+    content = b'{}'
+
+    def get_version(self):
+        return self.version
+
+
+@override_settings(CACHES=LOCMEM)
+class ConditionalGetTest(SimpleTestCase):
+
+    def get(self, version, **headers):
+        request = RequestFactory().get('/api/v1/movies/', **headers)
+        return CachedView.as_view(version=version)(request)
+
+    def test_etag_answers_304(self):
+        etag = self.get(1000.2)['ETag']
+        self.assertEqual(self.get(1000.2, HTTP_IF_NONE_MATCH=etag)
+                         .status_code, 304)
+        self.assertEqual(self.get(1000.7, HTTP_IF_NONE_MATCH=etag)
+                         .status_code, 200)
+
+    def test_last_modified_is_only_a_hint(self):
+        response = self.get(1000.2)
+        self.assertEqual(response['Last-Modified'], http_date(1001))
+        # изменение в ту же секунду: If-Modified-Since не даёт 304
+        response = self.get(1000.7,
+                            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
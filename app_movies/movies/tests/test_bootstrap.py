@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core import serializers
+from django.test import SimpleTestCase
+
+from movies.models import FilmWork
+from utils.bootstrap import Bootstrap
+from utils.bulk_import import COPY_NULL, CatalogImporter
+from .test_bulk_import import FILM_WORK_COLUMNS, NOW
+
+FIXTURE = settings.BASE_DIR.parent / 'config' / 'app_movies' / 'fixtures.json'
+
+
+class FixtureRowTest(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with open(FIXTURE, encoding='utf-8') as file:
+            cls.films = [item.object for item in serializers.deserialize(
+                'json', file, ignorenonexistent=True)
+                if isinstance(item.object, FilmWork)]
+
+    def copy_rows(self):
+        fields = FilmWork._meta.concrete_fields
+        for film in self.films:
+            row = Bootstrap._row(FilmWork, film)
+            yield film, {field.column: CatalogImporter._value(
+                field, FILM_WORK_COLUMNS[field.column], row, NOW)
+                for field in fields}
+
+    def test_fixture_round_trip(self):
+        self.assertEqual(len(self.films), 999)
+        for film, row in self.copy_rows():
+            self.assertEqual(row['id'], str(film.pk))
+            self.assertEqual(row['title'], film.title)
+            self.assertEqual(row['created'], str(film.created))
+            for column in ('creation_date', 'rating', 'type'):
+                # не текстовые колонки получают значение или NULL
+                self.assertNotEqual(row[column], '', column)
+
+    def test_missing_values_become_null(self):
+        rows = [row for _, row in self.copy_rows()]
+        self.assertTrue(all(row['creation_date'] == COPY_NULL
+                            for row in rows))
+        self.assertEqual(sum(row['rating'] == COPY_NULL for row in rows), 1)
+        self.assertTrue(all(row['file_path'] == COPY_NULL for row in rows))
+        self.assertTrue(all(row['certificate'] == COPY_NULL for row in rows))
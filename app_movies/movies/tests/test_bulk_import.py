@@ -0,0 +1,72 @@
+from django.test import SimpleTestCase
+
+from movies.models import FilmWork, Genre
+from utils.bulk_import import COPY_NULL, CatalogImporter, Column
+
+NOW = '2021-06-16T20:14:09+00:00'
+# колонки content.film_work из config/db/movies_database.sql
+FILM_WORK_COLUMNS = {
+    'id': Column(False, False),
+    'title': Column(False, True),
+    'description': Column(True, True),
+    'creation_date': Column(True, False),
+    'certificate': Column(True, True),
+    'file_path': Column(True, True),
+    'rating': Column(True, False),
+    'type': Column(True, False),
+    'created': Column(True, False),
+    'modified': Column(True, False),
+}
+
+
+def values(model, columns, row):
+    return {field.column: CatalogImporter._value(
+        field, columns[field.column], row, NOW)
+        for field in model._meta.concrete_fields}
+
+
+class CopyValueTest(SimpleTestCase):
+
+    def test_present_values_are_kept(self):
+        row = {'id': 'a', 'title': 'Star', 'rating': 8.5,
+               'creation_date': '2021-01-01', 'type': 'movie'}
+        result = values(FilmWork, FILM_WORK_COLUMNS, row)
+        self.assertEqual(result['rating'], 8.5)
+        self.assertEqual(result['creation_date'], '2021-01-01')
+        self.assertEqual(result['type'], 'movie')
+
+    def test_missing_values_in_nullable_columns(self):
+        # поля модели с null=False, но колонки допускают NULL
+        for value in (None, ''):
+            row = {'id': 'a', 'title': 'Star', 'creation_date': value,
+                   'rating': value, 'type': value}
+            result = values(FilmWork, FILM_WORK_COLUMNS, row)
+            self.assertEqual(result['creation_date'], COPY_NULL)
+            self.assertEqual(result['rating'], COPY_NULL)
+            self.assertEqual(result['type'], COPY_NULL)
+
+    def test_text_columns(self):
+        result = values(FilmWork, FILM_WORK_COLUMNS,
+                        {'id': 'a', 'title': None, 'description': '',
+                         'certificate': ''})
+        self.assertEqual(result['title'], '')
+        # django хранит пустое описание как '', сертификат - как NULL
+        self.assertEqual(result['description'], '')
+        self.assertEqual(result['certificate'], COPY_NULL)
+        result = values(FilmWork, FILM_WORK_COLUMNS,
+                        {'id': 'a', 'title': 'Star', 'description': None})
+        self.assertEqual(result['description'], COPY_NULL)
+
+    def test_timestamps_default_to_now(self):
+        result = values(FilmWork, FILM_WORK_COLUMNS, {'id': 'a'})
+        self.assertEqual(result['created'], NOW)
+        self.assertEqual(result['modified'], NOW)
+
+    def test_missing_description(self):
+        columns = {'id': Column(False, False), 'name': Column(False, True),
+                   'description': Column(True, True),
+                   'created': Column(True, False),
+                   'modified': Column(True, False)}
+        result = values(Genre, columns, {'id': 'a', 'name': 'Drama'})
+        self.assertEqual(result['name'], 'Drama')
+        self.assertEqual(result['description'], COPY_NULL)
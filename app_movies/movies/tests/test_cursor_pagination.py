@@ -0,0 +1,78 @@
+from django.core.exceptions import BadRequest
+from django.test import SimpleTestCase
+
+from movies.models import FilmWork
+from utils.cursor_pagination import (CursorPaginator, decode_cursor,
+                                     encode_cursor)
+
+ID = '00000000-0000-4000-8000-000000000001'
+
+
+def rows(*titles):
+    return [{'id': '00000000-0000-4000-8000-{:012d}'.format(number),
+             'title': title} for number, title in enumerate(titles, 1)]
+
+
+class CursorTokenTest(SimpleTestCase):
+
+    def test_round_trip(self):
+        data = {'k': 'Звёздные войны', 'id': ID, 'd': 'next'}
+        token = encode_cursor(data)
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token), data)
+
+    def test_invalid_token(self):
+        for token in ('not base64!', encode_cursor({'k': 'a'}),
+                      encode_cursor([1, 2])):
+            with self.assertRaises(BadRequest):
+                decode_cursor(token)
+
+    def test_tampered_token(self):
+        for data in ({'k': 'a', 'id': 'not-a-uuid', 'd': 'next'},
+                     {'k': 'a', 'id': 1, 'd': 'next'},
+                     {'k': ['a'], 'id': ID, 'd': 'next'},
+                     {'k': 'a', 'id': ID, 'd': True}):
+            with self.assertRaises(BadRequest):
+                decode_cursor(encode_cursor(data))
+
+
+class CursorPaginatorTest(SimpleTestCase):
+
+    def setUp(self):
+        self.paginator = CursorPaginator(FilmWork.objects.values(
+            'id', 'title'), per_page=2)
+
+    def test_first_page(self):
+        page = self.paginator._build_page(None, rows('a', 'b', 'c'))
+        self.assertIsNone(page['prev'])
+        self.assertEqual([row['title'] for row in page['results']],
+                         ['a', 'b'])
+        self.assertEqual(decode_cursor(page['next']),
+                         {'k': 'b', 'id': page['results'][1]['id'],
+                          'd': 'next'})
+
+    def test_last_page(self):
+        cursor = {'k': 'b', 'id': ID, 'd': 'next'}
+        page = self.paginator._build_page(cursor, rows('c'))
+        self.assertIsNone(page['next'])
+        self.assertEqual(decode_cursor(page['prev'])['k'], 'c')
+
+    def test_backwards_page_is_reversed(self):
+        cursor = {'k': 'd', 'id': ID, 'd': 'prev'}
+        page = self.paginator._build_page(cursor, rows('c', 'b', 'a'))
+        self.assertEqual([row['title'] for row in page['results']],
+                         ['b', 'c'])
+        self.assertEqual(decode_cursor(page['prev'])['k'], 'b')
+        self.assertEqual(decode_cursor(page['next'])['k'], 'c')
+
+    def test_row_comparison(self):
+        sql = str(self.paginator._page_queryset(
+            {'k': 'b', 'id': ID, 'd': 'next'}).query)
+        self.assertIn('("content"."film_work"."title", '
+                      '"content"."film_work"."id") > (b, {})'.format(ID), sql)
+        self.assertNotIn(' OR ', sql)
+
+        sql = str(self.paginator._page_queryset(
+            {'k': 'b', 'id': ID, 'd': 'prev'}).query)
+        self.assertIn(') < (', sql)
+        self.assertIn('ORDER BY "content"."film_work"."title" DESC', sql)
@@ -0,0 +1,37 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from utils.db_router import (ReplicaRoutingMiddleware, _read_from_replica,
+                             mark_written)
+
+LOCMEM = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM, DATABASE_REPLICAS=['replica_1'])
+class ReplicaRoutingTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.routed = []
+
+    def get_response(self, request):
+        self.routed.append(_read_from_replica.get())
+        return HttpResponse()
+
+    def request(self, path='/api/v1/movies/'):
+        ReplicaRoutingMiddleware(self.get_response)(
+            RequestFactory().get(path))
+        return self.routed[-1]
+
+    def test_api_reads_go_to_replica(self):
+        self.assertTrue(self.request())
+        self.assertFalse(self.request('/admin/'))
+        self.assertFalse(_read_from_replica.get())
+
+    def test_recent_write_reads_from_default(self):
+        mark_written()
+        self.assertFalse(self.request())
+        cache.clear()
+        self.assertTrue(self.request())
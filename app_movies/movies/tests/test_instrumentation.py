@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+from utils.instrumentation import Registry
+
+LABELS = (('alias', 'default'),)
+DEAD_PID = 99999999
+
+
+class SharedRegistryTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(
+            INSTRUMENTATION_METRICS_DIR=self.directory,
+            INSTRUMENTATION_FLUSH_INTERVAL=3600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def worker_file(self, pid, counter, gauge):
+        labels = [list(pair) for pair in LABELS]
+        with open(os.path.join(self.directory, '{}.json'.format(pid)),
+                  'w') as file:
+            json.dump({
+                'histograms': [['h_seconds', labels, [0.1, 1], [0, 1, 0],
+                                0.5]],
+                'counters': [['c_total', labels, counter]],
+                'gauges': [['g', labels, gauge]],
+            }, file)
+
+    def test_render_sums_all_workers(self):
+        registry = Registry()
+        registry.observe('h_seconds', LABELS, 0.05, (0.1, 1))
+        registry.inc('c_total', LABELS)
+        registry.set('g', LABELS, 2)
+        self.worker_file(os.getppid(), counter=3, gauge=5)
+        # счётчики завершившегося воркера остаются, датчики - нет
+        self.worker_file(DEAD_PID, counter=4, gauge=7)
+
+        lines = registry.render().splitlines()
+        self.assertIn('c_total{alias="default"} 8', lines)
+        self.assertIn('g{alias="default"} 7', lines)
+        self.assertIn('h_seconds_bucket{alias="default",le="0.1"} 1', lines)
+        self.assertIn('h_seconds_count{alias="default"} 3', lines)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, '{}.json'.format(os.getpid()))))
+
+    @override_settings(INSTRUMENTATION_METRICS_DIR='')
+    def test_render_without_directory(self):
+        registry = Registry()
+        registry.inc('c_total', LABELS)
+        self.assertIn('c_total{alias="default"} 1',
+                      registry.render().splitlines())
@@ -0,0 +1,70 @@
+from django.test import SimpleTestCase
+from psycopg2 import OperationalError, extensions
+
+from utils.pg_pool.pool import ConnectionPool
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if self.connection.fail:
+            raise OperationalError('server closed the connection')
+        if sql == 'DISCARD ALL' and not self.connection.autocommit:
+            raise AssertionError('DISCARD ALL inside a transaction')
+        self.connection.executed.append(sql)
+
+
+class FakeInfo:
+    transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    closed = 0
+    fail = False
+
+    def __init__(self):
+        self.autocommit = False
+        self.executed = []
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.executed.append('ROLLBACK')
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool(FakeConnection, 'test', max_size=2)
+
+    def test_session_is_discarded_on_return(self):
+        connection = self.pool.getconn()
+        connection.info.transaction_status = \
+            extensions.TRANSACTION_STATUS_INTRANS
+        self.pool.putconn(connection)
+        self.assertEqual(connection.executed, ['ROLLBACK', 'DISCARD ALL'])
+        self.assertFalse(connection.autocommit)
+        self.assertIs(self.pool.getconn(), connection)
+
+    def test_failed_reset_drops_connection(self):
+        connection = self.pool.getconn()
+        connection.fail = True
+        self.pool.putconn(connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool.size, 0)
+        self.assertIsNot(self.pool.getconn(), connection)
@@ -0,0 +1,97 @@
+from itertools import product
+
+from django.contrib.admin import helpers
+from django.db import connection, transaction
+from django.template.response import TemplateResponse
+from django.utils import timezone
+
+from movies.models import FilmWork
+from utils.api_cache import invalidate_films
+from utils.bulk_import import batched
+
+BATCH_SIZE = 1000
+
+
+def touch_films(film_ids) -> None:
+    """Один UPDATE modified для затронутых фильмов и сброс кэша API"""
+    film_ids = list(film_ids)
+    if not film_ids:
+        return
+    FilmWork.objects.filter(id__in=film_ids).update(modified=timezone.now())
+    transaction.on_commit(lambda: invalidate_films(film_ids))
+
+
+def add_links(model, target: str, film_ids, target_ids, **values) -> int:
+    """
+    Добавить связи фильм - target (жанр, персона) для всех пар
+    film_ids x target_ids одной транзакцией. Существующие связи
+    пропускаются, modified обновляется только у фильмов с новыми связями.
+    """
+    film_ids, target_ids = list(film_ids), list(target_ids)
+    column = '{}_id'.format(target)
+    with transaction.atomic():
+        existing = set(model._default_manager.filter(
+            film_work_id__in=film_ids,
+            **{'{}__in'.format(column): target_ids},
+            **values,
+        ).values_list('film_work_id', column))
+        links = [
+            model(film_work_id=film_id, **{column: target_id}, **values)
+            for film_id, target_id in product(film_ids, target_ids)
+            if (film_id, target_id) not in existing
+        ]
+        model._default_manager.bulk_create(
+            links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        touch_films({link.film_work_id for link in links})
+    return len(links)
+
+
+def remove_links(model, target: str, film_ids, target_ids, **values) -> int:
+    """
+    Удалить связи фильм - target. Строки удаляются запросом по id без
+    загрузки объектов и сигналов на каждую строку, кэш API сбрасывается
+    один раз для всех затронутых фильмов.
+    """
+    with transaction.atomic():
+        rows = list(model._default_manager.filter(
+            film_work_id__in=list(film_ids),
+            **{'{}_id__in'.format(target): list(target_ids)},
+            **values,
+        ).values_list('id', 'film_work_id'))
+        with connection.cursor() as cursor:
+            for chunk in batched([pk for pk, _ in rows], BATCH_SIZE):
+                cursor.execute('DELETE FROM {} WHERE id = ANY(%s)'.format(
+                    connection.ops.quote_name(model._meta.db_table)),
+                    [chunk])
+        touch_films({film_id for _, film_id in rows})
+    return len(rows)
+
+
+def action_form(model_admin, request, form_class, title):
+    """
+    Промежуточная страница действия админки: возвращает (форма, None),
+    если форма отправлена и корректна, иначе (None, ответ со страницей).
+    """
+    if 'apply' in request.POST:
+        form = form_class(request.POST)
+        if form.is_valid():
+            return form, None
+    else:
+        form = form_class()
+
+    selected = request.POST.getlist(helpers.ACTION_CHECKBOX_NAME)
+    select_across = request.POST.get('select_across') == '1'
+    context = {
+        **model_admin.admin_site.each_context(request),
+        'title': title,
+        'opts': model_admin.model._meta,
+        'form': form,
+        'media': model_admin.media + form.media,
+        'action': request.POST.get('action'),
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        'selected': selected,
+        'select_across': select_across,
+        'count': None if select_across else len(selected),
+    }
+    return None, TemplateResponse(
+        request, 'admin/movies/link_action.html', context)
@@ -0,0 +1,58 @@
+import json
+
+from django.conf import settings
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from utils.cursor_pagination import estimated_count
+
+
+def explain_count(queryset) -> int:
+    """Оценка числа строк выборки по плану запроса"""
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки без COUNT(*) по большим таблицам: число строк берётся
+    из статистики pg_class (без фильтров) или из EXPLAIN (с фильтрами).
+    Точный подсчёт выполняется, только если оценка меньше
+    ADMIN_EXACT_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        if self.object_list.query.where:
+            estimate = explain_count(self.object_list)
+        else:
+            estimate = estimated_count(self.object_list.model)
+        if estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+class LeanChangeList(ChangeList):
+    """Список объектов читает только поля из list_display"""
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        fields = {field.name for field in self.lookup_opts.concrete_fields}
+        columns = [name for name in self.list_display
+                   if isinstance(name, str) and name in fields]
+        if not columns:
+            return queryset
+        return queryset.only(*columns)
+
+
+class LeanChangeListMixin:
+    paginator = EstimatedCountPaginator
+    # без второго COUNT(*) по всей таблице для "показать все"
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return LeanChangeList
@@ -0,0 +1,163 @@
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.forms.models import BaseInlineFormSet
+from django.urls import NoReverseMatch, reverse
+from django.utils.text import Truncator
+
+
+def parse_page(value) -> int:
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+class LoadedRawIdWidget(ForeignKeyRawIdWidget):
+    """
+    Поле raw_id, подпись которого строится по уже загруженному объекту
+    строки (obj), а не отдельным запросом на каждую строку.
+    """
+    obj = None
+
+    def label_and_url_for_value(self, value):
+        key = self.rel.get_related_field().name
+        if self.obj is None or str(getattr(self.obj, key)) != str(value):
+            return super().label_and_url_for_value(value)
+        try:
+            url = reverse('{}:{}_{}_change'.format(
+                self.admin_site.name, self.obj._meta.app_label,
+                self.obj._meta.model_name), args=(self.obj.pk,))
+        except NoReverseMatch:
+            url = ''
+        return Truncator(self.obj).words(14), url
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Формсет, который показывает одну страницу связанных строк (с поиском)
+    и сохраняет изменения пачкой: bulk_create, bulk_update и один DELETE.
+    Параметры страницы задаёт PaginatedInlineMixin.get_formset.
+    """
+    per_page = 50
+    page_number = 1
+    page_param = 'page'
+    search_param = 'q'
+    search_field = None
+    search = ''
+    query = None
+    has_next = False
+    # связи, загружаемые вместе со страницей (поля raw_id)
+    related_fields = ()
+
+    def get_queryset(self):
+        if not hasattr(self, '_page'):
+            queryset = super().get_queryset()
+            if self.related_fields:
+                queryset = queryset.select_related(*self.related_fields)
+            if self.search_field and self.search:
+                queryset = queryset.filter(**{
+                    '{}__ilike'.format(self.search_field): self.search})
+            start = (self.page_number - 1) * self.per_page
+            # строка сверх страницы лишь показывает, есть ли следующая
+            rows = list(queryset[start:start + self.per_page + 1])
+            self.has_next = len(rows) > self.per_page
+            self._page = rows[:self.per_page]
+        return self._page
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        for name in self.related_fields:
+            widget = form.fields[name].widget
+            field = form.instance._meta.get_field(name)
+            if isinstance(widget, LoadedRawIdWidget) and \
+                    field.is_cached(form.instance):
+                widget.obj = getattr(form.instance, name)
+        return form
+
+    def page_query(self, number: int) -> str:
+        query = self.query.copy()
+        query[self.page_param] = number
+        return query.urlencode()
+
+    @property
+    def prev_query(self) -> str:
+        return self.page_query(self.page_number - 1)
+
+    @property
+    def next_query(self) -> str:
+        return self.page_query(self.page_number + 1)
+
+    def save_new_objects(self, commit=True):
+        self.new_objects = []
+        for form in self.extra_forms:
+            if not form.has_changed():
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            self.new_objects.append(self.save_new(form, commit=False))
+            if not commit:
+                self.saved_forms.append(form)
+        if commit and self.new_objects:
+            self.model._default_manager.bulk_create(self.new_objects)
+        return self.new_objects
+
+    def save_existing_objects(self, commit=True):
+        self.changed_objects = []
+        self.deleted_objects = []
+        saved_instances = []
+        forms_to_delete = self.deleted_forms
+        for form in self.initial_forms:
+            obj = form.instance
+            if obj.pk is None:
+                continue
+            if form in forms_to_delete:
+                self.deleted_objects.append(obj)
+            elif form.has_changed():
+                self.changed_objects.append((obj, form.changed_data))
+                saved_instances.append(
+                    self.save_existing(form, obj, commit=False))
+                if not commit:
+                    self.saved_forms.append(form)
+        if not commit:
+            return saved_instances
+
+        manager = self.model._default_manager
+        if self.deleted_objects:
+            manager.filter(
+                pk__in=[obj.pk for obj in self.deleted_objects]).delete()
+        fields = {name for _, changed in self.changed_objects
+                  for name in changed}
+        if saved_instances:
+            manager.bulk_update(saved_instances, sorted(fields))
+        return saved_instances
+
+
+class PaginatedInlineMixin:
+    """
+    Инлайн, который загружает связанные строки постранично: время открытия
+    и сохранения формы не зависит от их общего числа.
+    """
+    formset = PaginatedInlineFormSet
+    per_page = 50
+    page_param = 'page'
+    search_param = 'q'
+    search_field = None
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.raw_id_fields:
+            kwargs['widget'] = LoadedRawIdWidget(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        # inlineformset_factory каждый раз создаёт новый класс
+        formset.per_page = self.per_page
+        formset.page_param = self.page_param
+        formset.search_param = self.search_param
+        formset.search_field = self.search_field
+        formset.related_fields = tuple(self.raw_id_fields)
+        formset.page_number = parse_page(request.GET.get(self.page_param))
+        formset.search = request.GET.get(self.search_param, '').strip()
+        formset.query = request.GET.copy()
+        return formset
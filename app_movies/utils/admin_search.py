@@ -0,0 +1,101 @@
+import uuid
+from functools import lru_cache, reduce
+from operator import and_, or_
+
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import CharField, Lookup, Q, TextField
+from django.db.models.functions import Greatest
+from django.utils.text import smart_split, unescape_string_literal
+
+
+class ILike(Lookup):
+    """
+    col ILIKE '%term%' без UPPER() над колонкой, который добавляет
+    icontains, - такое условие использует GIN индекс gin_trgm_ops.
+    """
+    lookup_name = 'ilike'
+
+    def get_db_prep_lookup(self, value, connection):
+        return '%s', ['%{}%'.format(connection.ops.prep_for_like_query(value))]
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '{} ILIKE {}'.format(lhs, rhs), lhs_params + rhs_params
+
+
+CharField.register_lookup(ILike)
+TextField.register_lookup(ILike)
+
+
+def parse_uuid(value: str):
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return None
+
+
+class SimilarityOrderingMixin:
+    """
+    ChangeList ставит сортировку модели впереди сортировки выборки, поэтому
+    порядок по похожести задаётся здесь. Сортировка, выбранная в
+    заголовке таблицы, важнее.
+    """
+
+    def get_ordering(self, request, queryset):
+        if 'search_similarity' in queryset.query.annotations and \
+                ORDER_VAR not in self.params:
+            return ['-search_similarity', '-pk']
+        return super().get_ordering(request, queryset)
+
+
+@lru_cache(maxsize=None)
+def similarity_changelist(changelist):
+    return type('Similarity{}'.format(changelist.__name__),
+                (SimilarityOrderingMixin, changelist), {})
+
+
+class TrigramSearchMixin:
+    """
+    Поиск админки по триграммным индексам: текстовые поля из search_fields
+    сравниваются через ILIKE, результат сортируется по похожести на
+    запрос. Поиск по id - точное сравнение с UUID без приведения к тексту.
+    """
+
+    def get_changelist(self, request, **kwargs):
+        return similarity_changelist(
+            super().get_changelist(request, **kwargs))
+
+    def get_search_results(self, request, queryset, search_term):
+        search_fields = self.get_search_fields(request)
+        search_term = search_term.strip()
+        if not search_fields or not search_term:
+            return queryset, False
+
+        if 'id' in search_fields:
+            pk = parse_uuid(search_term)
+            if pk is not None:
+                return queryset.filter(pk=pk), False
+        text_fields = [name for name in search_fields if name != 'id']
+        if not text_fields:
+            return queryset.none(), False
+
+        words = []
+        for bit in smart_split(search_term):
+            if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+                bit = unescape_string_literal(bit)
+            words.append(bit)
+        queryset = queryset.filter(reduce(and_, (
+            reduce(or_, (Q(**{'{}__ilike'.format(name): word})
+                         for name in text_fields))
+            for word in words
+        )))
+
+        similarity = [TrigramSimilarity(name, search_term)
+                      for name in text_fields]
+        if len(similarity) > 1:
+            similarity = [Greatest(*similarity)]
+        queryset = queryset.annotate(
+            search_similarity=similarity[0]).order_by('-search_similarity')
+        return queryset, False
@@ -0,0 +1,161 @@
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from math import ceil
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from utils.db_router import mark_written
+
+LIST_VERSION_KEY = 'movies:api:list:version'
+FILM_VERSION_KEY = 'movies:api:film:{}:version'
+FILM_BASE_VERSION_KEY = 'movies:api:film:version'
+RESPONSE_KEY = 'movies:api:response:{}:{}'
+
+
+def _version(key: str) -> float:
+    # версия - время последнего изменения, см. invalidate_films
+    version = cache.get(key)
+    if version is None:
+        now = time.time()
+        cache.add(key, now, settings.MOVIES_API_VERSION_TIMEOUT)
+        # DummyCache ничего не хранит
+        version = cache.get(key, now)
+    return version
+
+
+async def _aversion(key: str) -> float:
+    version = await cache.aget(key)
+    if version is None:
+        now = time.time()
+        await cache.aadd(key, now, settings.MOVIES_API_VERSION_TIMEOUT)
+        version = await cache.aget(key, now)
+    return version
+
+
+def list_version() -> float:
+    return _version(LIST_VERSION_KEY)
+
+
+def film_version(film_id) -> float:
+    # ключ версии фильма создаёт только invalidate_films, до этого
+    # действует общая версия: запросы по любым id не плодят ключей
+    key = FILM_VERSION_KEY.format(film_id)
+    versions = cache.get_many([key, FILM_BASE_VERSION_KEY])
+    return versions.get(key) or versions.get(FILM_BASE_VERSION_KEY) or \
+        _version(FILM_BASE_VERSION_KEY)
+
+
+async def alist_version() -> float:
+    return await _aversion(LIST_VERSION_KEY)
+
+
+async def afilm_version(film_id) -> float:
+    key = FILM_VERSION_KEY.format(film_id)
+    versions = await cache.aget_many([key, FILM_BASE_VERSION_KEY])
+    return versions.get(key) or versions.get(FILM_BASE_VERSION_KEY) or \
+        await _aversion(FILM_BASE_VERSION_KEY)
+
+
+def invalidate_films(film_ids: Iterable) -> None:
+    """
+    Сбросить закэшированные ответы API для фильмов: карточки этих фильмов
+    и все страницы списка (состав и порядок страниц мог измениться).
+    """
+    # до смены версий, чтобы новую версию не заполнили ответы реплик
+    mark_written()
+    now = time.time()
+    cache.set_many(
+        {FILM_VERSION_KEY.format(film_id): now for film_id in film_ids},
+        settings.MOVIES_API_VERSION_TIMEOUT
+    )
+    cache.set(LIST_VERSION_KEY, now, settings.MOVIES_API_VERSION_TIMEOUT)
+
+
+class ApiCacheMixin(ABC):
+    """
+    Кэш готовых JSON ответов. Ключ включает версию данных (get_version)
+    и путь с параметрами запроса, поэтому после изменения фильма старые
+    ответы просто перестают использоваться. По той же версии строятся
+    ETag и Last-Modified, на If-None-Match отдаётся 304. Last-Modified -
+    только подсказка: у него секундная точность, и изменение в ту же
+    секунду не отличить, поэтому If-Modified-Since не проверяется.
+    """
+
+    @abstractmethod
+    def get_version(self) -> float:
+        pass
+
+    def get_digest(self) -> str:
+        params = sorted(self.request.GET.lists())
+        return hashlib.md5(
+            '{}?{}'.format(self.request.path, params).encode()
+        ).hexdigest()
+
+    def get_validators(self, version: float):
+        etag = quote_etag('{}-{}'.format(version, self.get_digest()))
+        return etag, ceil(version)
+
+    @staticmethod
+    def set_validators(response, etag: str, last_modified: int):
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, public=True,
+                                max_age=settings.MOVIES_API_MAX_AGE,
+                                must_revalidate=True)
+        return response
+
+    def get(self, request, *args, **kwargs):
+        # валидаторы строятся по версии данных, без запросов к postgres
+        version = self.get_version()
+        etag, last_modified = self.get_validators(version)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = RESPONSE_KEY.format(version, self.get_digest())
+            content = cache.get(key)
+            if content is not None:
+                response = HttpResponse(content,
+                                        content_type='application/json')
+            else:
+                response = super().get(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response.content,
+                              settings.MOVIES_API_CACHE_TIMEOUT)
+        return self.set_validators(response, etag, last_modified)
+
+
+class AsyncApiCacheMixin(ApiCacheMixin):
+    """То же для асинхронных представлений, ответ строит aget_response"""
+
+    @abstractmethod
+    async def get_version(self) -> float:
+        pass
+
+    @abstractmethod
+    async def aget_response(self, request, *args, **kwargs):
+        pass
+
+    async def get(self, request, *args, **kwargs):
+        version = await self.get_version()
+        etag, last_modified = self.get_validators(version)
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            key = RESPONSE_KEY.format(version, self.get_digest())
+            content = await cache.aget(key)
+            if content is not None:
+                response = HttpResponse(content,
+                                        content_type='application/json')
+            else:
+                response = await self.aget_response(request, *args, **kwargs)
+                if response.status_code == 200:
+                    await cache.aset(key, response.content,
+                                     settings.MOVIES_API_CACHE_TIMEOUT)
+        return self.set_validators(response, etag, last_modified)
@@ -0,0 +1,199 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user_model,
+)
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection
+
+from movies.models import FilmWork
+from utils.bootstrap import get_fingerprint, set_fingerprint
+from utils.bulk_import import IMPORT_MODELS, CatalogImporter, qualified_name
+from utils.catalog_generator import CatalogGenerator
+from utils.loadtest import run_load
+
+BENCH_USER = 'benchmark'
+SERVER_START_TIMEOUT = 60
+# управление соединениями с базой, см. config/components/database.py
+CONNECTION_MODES = {
+    'off': {'POSTGRES_POOL': 'False', 'POSTGRES_CONN_MAX_AGE': '0'},
+    'persistent': {'POSTGRES_POOL': 'False', 'POSTGRES_CONN_MAX_AGE': '600'},
+    'on': {'POSTGRES_POOL': 'True'},
+}
+
+
+def prepare_database() -> str:
+    """
+    Отдельная база test_<POSTGRES_DB> со всеми миграциями: замеры никогда
+    не трогают рабочие данные. База сохраняется между запусками.
+    """
+    return connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=True)
+
+
+def seed(films: int, persons: int, cast: int, log) -> bool:
+    """Загрузить каталог заданного размера, если он ещё не загружен"""
+    if not connection.settings_dict['NAME'].startswith('test_'):
+        raise RuntimeError('benchmark data is loaded only into test_* base')
+    fingerprint = '{}:{}:{}'.format(films, persons, cast)
+    if get_fingerprint('benchmark:catalog') == fingerprint:
+        return False
+
+    tables = [qualified_name(model) for model in IMPORT_MODELS]
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('content.film_work_read')")
+        if cursor.fetchone()[0]:
+            tables.append('content.film_work_read')
+        cursor.execute('TRUNCATE {} CASCADE'.format(', '.join(tables)))
+    with tempfile.TemporaryDirectory() as directory:
+        log('generating {} films, {} persons'.format(films, persons))
+        CatalogGenerator(films, persons, cast_per_film=cast).write(directory)
+        CatalogImporter(drop_indexes=True, offline=True,
+                        log=log).run(directory)
+    set_fingerprint('benchmark:catalog', fingerprint)
+    return True
+
+
+def admin_cookie() -> str:
+    """Сессия суперпользователя для запросов к админке"""
+    user, _ = get_user_model()._default_manager.get_or_create(
+        username=BENCH_USER, defaults={'is_staff': True, 'is_superuser': True})
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return '{}={}'.format(settings.SESSION_COOKIE_NAME, session.session_key)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(database: str, workers: int = 2, asgi: bool = False,
+                 cached: bool = False, connections: str = 'off'):
+    """gunicorn на свободном порту поверх базы замеров, отдаёт его адрес"""
+    port = free_port()
+    env = {
+        **os.environ,
+        'POSTGRES_DB': database,
+        'POSTGRES_REPLICA_HOSTS': '',
+        'DEBUG': 'False',
+        'ALLOWED_HOSTS': '127.0.0.1',
+        'CACHE_DISABLED': 'False' if cached else 'True',
+        'MOVIES_API_ASYNC': 'True' if asgi else 'False',
+        **CONNECTION_MODES[connections],
+    }
+    application = 'config.{}:application'.format('asgi' if asgi else 'wsgi')
+    command = [sys.executable, '-m', 'gunicorn', application,
+               '--bind', '127.0.0.1:{}'.format(port),
+               '--workers', str(workers)]
+    if asgi:
+        command += ['--worker-class', 'uvicorn.workers.UvicornWorker']
+    server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('server did not start')
+                time.sleep(0.2)
+        yield 'http://127.0.0.1:{}'.format(port)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def scale_paths(films: int) -> Dict[str, List[str]]:
+    """Проверяемые адреса: первая, средняя и последняя страницы"""
+    film = FilmWork.objects.values_list('id', flat=True).first()
+    middle_api = max(films // settings.MOVIES_PAGE_PAGINATE_BY // 2, 1)
+    middle_admin = max(films // 100 // 2, 1)
+    return {
+        'api': [
+            '/api/v1/movies/',
+            '/api/v1/movies/?page={}'.format(middle_api),
+            '/api/v1/movies/?page=last',
+            '/api/v1/movies/?cursor=',
+            '/api/v1/movies/?fields=id,title',
+            '/api/v1/movies/{}/'.format(film),
+        ],
+        'admin': [
+            '/admin/movies/filmwork/',
+            '/admin/movies/filmwork/?p={}'.format(middle_admin),
+            '/admin/movies/filmwork/?q=star',
+            '/admin/movies/person/',
+        ],
+    }
+
+
+def run_suite(base_url: str, paths: Dict[str, List[str]], cookie: str,
+              concurrency: int, duration: float) -> Dict[str, dict]:
+    """Каждый адрес нагружается отдельно, чтобы замеры не смешивались"""
+    report = {}
+    for group, group_paths in paths.items():
+        headers = {'Cookie': cookie} if group == 'admin' else {}
+        for path in group_paths:
+            report.update(run_load(base_url, [path], concurrency=concurrency,
+                                   duration=duration, headers=headers))
+    return report
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_results(directory: str, results: dict) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, '{}-{}.json'.format(
+        datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S'),
+        results['commit']))
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+    return path
+
+
+def compare(previous: dict, current: dict) -> str:
+    """Изменение rps и p95 по каждому адресу относительно прошлого замера"""
+    lines = ['{:<10} {:<50} {:>10} {:>10}'.format(
+        'scale', 'path', 'rps', 'p95')]
+    for scale, report in current['scales'].items():
+        before = previous['scales'].get(scale, {})
+        for path, row in report.items():
+            old = before.get(path)
+            if not old:
+                continue
+            lines.append('{:<10} {:<50} {:>10} {:>10}'.format(
+                scale, path[:50], _delta(old['rps'], row['rps']),
+                _delta(old['p95'], row['p95'])))
+    return '\n'.join(lines)
+
+
+def _delta(old: float, new: float) -> str:
+    if not old:
+        return '-'
+    return '{:+.1f}%'.format((new - old) / old * 100)
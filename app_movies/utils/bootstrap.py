@@ -0,0 +1,178 @@
+import hashlib
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.finders import get_finders
+from django.core import serializers
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import FileField
+from django.db.migrations.executor import MigrationExecutor
+
+from utils.api_cache import invalidate_films
+from utils.bulk_import import IMPORT_MODELS, CatalogImporter, batched
+
+STEPS_TABLE = 'bootstrap_step'
+STATIC_FINGERPRINT_FILE = '.bootstrap'
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_fingerprint(step: str):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE IF NOT EXISTS {} (step text PRIMARY KEY, '
+            'fingerprint text NOT NULL, applied timestamptz NOT NULL)'
+            .format(STEPS_TABLE))
+        cursor.execute(
+            'SELECT fingerprint FROM {} WHERE step = %s'.format(STEPS_TABLE),
+            [step])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def set_fingerprint(step: str, fingerprint: str) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {} (step, fingerprint, applied) '
+            'VALUES (%s, %s, now()) ON CONFLICT (step) DO UPDATE '
+            'SET fingerprint = EXCLUDED.fingerprint, applied = now()'
+            .format(STEPS_TABLE), [step, fingerprint])
+
+
+class Bootstrap:
+    """
+    Подготовка контейнера к запуску. Каждый шаг сначала проверяет, нужен
+    ли он: есть ли непримененные миграции, изменились ли .po и статика,
+    загружалась ли уже эта версия фикстуры. Из фикстуры добавляются
+    только отсутствующие в базе объекты, существующие строки не
+    перезаписываются и modified у них не меняется.
+    """
+
+    def __init__(self, log=None):
+        self.log = log or (lambda message: None)
+
+    def migrate(self) -> None:
+        executor = MigrationExecutor(connection)
+        applied = executor.loader.applied_migrations
+        if ('movies', '0001_initial') not in applied and \
+                'film_work' in connection.introspection.table_names():
+            # схема создана SQL скриптом базы, первая миграция уже применена
+            call_command('migrate', 'movies', '0001', fake=True)
+            executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            self.log('migrate: up to date')
+            return
+        call_command('migrate', interactive=False)
+
+    def createcachetable(self) -> None:
+        if not any(cache['BACKEND'].endswith('DatabaseCache')
+                   for cache in settings.CACHES.values()):
+            self.log('createcachetable: no database cache')
+            return
+        call_command('createcachetable')
+
+    def compilemessages(self) -> None:
+        stale = False
+        for root, _, files in os.walk(settings.BASE_DIR):
+            for name in files:
+                if not name.endswith('.po'):
+                    continue
+                po = os.path.join(root, name)
+                mo = po[:-3] + '.mo'
+                if not os.path.exists(mo) or \
+                        os.path.getmtime(mo) < os.path.getmtime(po):
+                    stale = True
+        if not stale:
+            self.log('compilemessages: up to date')
+            return
+        call_command('compilemessages', locale=['en', 'ru'])
+
+    def collectstatic(self) -> None:
+        digest = hashlib.sha256()
+        for finder in get_finders():
+            for path, storage in finder.list(['CVS', '.*', '*~']):
+                stat = os.stat(storage.path(path))
+                digest.update('{}:{}:{}\n'.format(
+                    path, stat.st_size, stat.st_mtime).encode())
+        fingerprint = digest.hexdigest()
+        marker = os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE)
+        if os.path.exists(marker):
+            with open(marker) as file:
+                if file.read() == fingerprint:
+                    self.log('collectstatic: up to date')
+                    return
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(marker, 'w') as file:
+            file.write(fingerprint)
+
+    def createsuperuser(self, username: str, email: str) -> None:
+        if get_user_model()._default_manager.filter(
+                username=username).exists():
+            self.log('createsuperuser: {} exists'.format(username))
+            return
+        call_command('createsuperuser', interactive=False,
+                     username=username, email=email)
+
+    def load_fixture(self, path: str) -> int:
+        step = 'fixture:{}'.format(os.path.basename(path))
+        fingerprint = file_digest(path)
+        if get_fingerprint(step) == fingerprint:
+            self.log('{}: already loaded'.format(step))
+            return 0
+
+        objects = defaultdict(list)
+        with open(path, encoding='utf-8') as file:
+            for item in serializers.deserialize('json', file,
+                                                ignorenonexistent=True):
+                objects[type(item.object)].append(item)
+        # модели каталога - в порядке внешних ключей, остальные следом
+        models = [model for model in IMPORT_MODELS if model in objects]
+        models += [model for model in objects if model not in models]
+
+        importer = CatalogImporter()
+        created = 0
+        with transaction.atomic():
+            for model in models:
+                items = self._missing(model, objects[model])
+                if model in IMPORT_MODELS:
+                    created += importer.load(model, (
+                        self._row(model, item.object) for item in items))
+                else:
+                    for item in items:
+                        item.save()
+                    created += len(items)
+            set_fingerprint(step, fingerprint)
+        if created:
+            invalidate_films([])
+        self.log('{}: {} objects added'.format(step, created))
+        return created
+
+    @staticmethod
+    def _missing(model, items: list) -> list:
+        existing = set()
+        for chunk in batched([item.object.pk for item in items], 1000):
+            existing.update(model._base_manager.filter(
+                pk__in=chunk).values_list('pk', flat=True))
+        return [item for item in items if item.object.pk not in existing]
+
+    @staticmethod
+    def _row(model, obj) -> dict:
+        row = {}
+        for field in model._meta.concrete_fields:
+            value = getattr(obj, field.attname)
+            # пустой FieldFile - это отсутствие файла, а не имя ''
+            if value is None or isinstance(field, FileField) and not value:
+                row[field.column] = None
+            else:
+                row[field.column] = str(value)
+        return row
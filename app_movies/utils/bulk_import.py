@@ -0,0 +1,236 @@
+import csv
+import io
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple
+
+from django.db import connection, transaction
+
+from movies.models import (
+    FilmWork,
+    Genre,
+    GenreFilmWork,
+    Person,
+    PersonFilmWork,
+)
+from utils.api_cache import invalidate_films
+
+# порядок загрузки: справочники и фильмы раньше таблиц связей
+IMPORT_MODELS = (Genre, Person, FilmWork, GenreFilmWork, PersonFilmWork)
+TIMESTAMP_FIELDS = ('created', 'modified')
+COPY_NULL = '\\N'
+TEXT_TYPES = ('text', 'character varying', 'character')
+
+COLUMNS_SQL = """
+SELECT column_name, is_nullable = 'YES', data_type IN %s
+FROM information_schema.columns
+WHERE table_schema = 'content' AND table_name = %s
+"""
+
+SECONDARY_INDEXES_SQL = """
+SELECT n.nspname, c.relname, pg_get_indexdef(i.indexrelid)
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE i.indrelid = %s::regclass AND NOT i.indisprimary AND NOT i.indisunique
+"""
+
+
+def table_name(model) -> str:
+    return model._meta.db_table.split('"."')[-1]
+
+
+def qualified_name(model) -> str:
+    return 'content.{}'.format(table_name(model))
+
+
+def find_source(directory: str, model):
+    for extension in ('.csv', '.ndjson'):
+        path = os.path.join(directory, table_name(model) + extension)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """Строки CSV (с заголовком) или NDJSON файла"""
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.ndjson'):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+class Column(NamedTuple):
+    nullable: bool
+    text: bool
+
+
+def table_columns(model) -> Dict[str, Column]:
+    """
+    Допустимость NULL берётся из схемы базы, а не из модели: схема
+    создана SQL скриптом и разрешает NULL там, где модель его не ждёт.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(COLUMNS_SQL, [TEXT_TYPES, table_name(model)])
+        return {name: Column(nullable, text)
+                for name, nullable, text in cursor.fetchall()}
+
+
+def batched(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class CatalogImporter:
+    """
+    Загрузка каталога через COPY: каждая пачка копируется во временную
+    таблицу и переносится в content.* через INSERT ... ON CONFLICT DO NOTHING
+    в отдельной транзакции, поэтому повторный импорт не дублирует строки.
+    Триггеры таблиц (журнал удалений, модель чтения) работают как обычно,
+    модель чтения пересчитывается по каждой пачке. Только при offline
+    на время загрузки отключаются пользовательские триггеры, а модель
+    чтения пересчитывается целиком в конце; это блокирует таблицы и
+    допустимо лишь без параллельных правок. По желанию неуникальные
+    индексы удаляются и затем строятся заново.
+    """
+
+    def __init__(self, batch_size: int = 50000, drop_indexes: bool = False,
+                 offline: bool = False, log=None):
+        self.batch_size = batch_size
+        self.drop_indexes = drop_indexes
+        self.offline = offline
+        self.log = log or (lambda message: None)
+
+    def run(self, directory: str) -> dict:
+        sources = [(model, find_source(directory, model))
+                   for model in IMPORT_MODELS]
+        sources = [(model, path) for model, path in sources if path]
+        if not sources:
+            return {}
+
+        counts = {}
+        models = [model for model, _ in sources]
+        with self._triggers_disabled(models), self._indexes_dropped(models):
+            for model, path in sources:
+                counts[table_name(model)] = self.load(model, read_rows(path))
+                self.log('{}: {} rows'.format(
+                    table_name(model), counts[table_name(model)]))
+        self._finish(models)
+        return counts
+
+    def load(self, model, rows: Iterable[dict]) -> int:
+        fields = list(model._meta.concrete_fields)
+        columns = table_columns(model)
+        fields = [(field, columns[field.column]) for field in fields
+                  if field.column in columns]
+        now = datetime.now(timezone.utc).isoformat()
+        total = 0
+        for batch in batched(rows, self.batch_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow([self._value(field, column, row, now)
+                                 for field, column in fields])
+            buffer.seek(0)
+            total += self._copy(model, [field.column for field, _ in fields],
+                                buffer)
+        return total
+
+    @staticmethod
+    def _value(field, column: Column, row: dict, now: str):
+        value = row.get(field.column, row.get(field.name))
+        if value is not None and value != '':
+            return value
+        if field.name in TIMESTAMP_FIELDS:
+            return now
+        # пустая строка остаётся строкой только в текстовых колонках:
+        # NOT NULL или поля, которые django хранит как '' (null=False)
+        if column.text and (not column.nullable or
+                            (value == '' and not field.null)):
+            return ''
+        return COPY_NULL
+
+    @staticmethod
+    def _copy(model, columns: List[str], buffer) -> int:
+        column_list = ', '.join(columns)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE import_stage (LIKE {}) ON COMMIT DROP'
+                .format(qualified_name(model)))
+            cursor.copy_expert(
+                "COPY import_stage ({}) FROM STDIN "
+                "WITH (FORMAT csv, NULL '{}')".format(column_list, COPY_NULL),
+                buffer)
+            cursor.execute(
+                'INSERT INTO {table} ({columns}) SELECT {columns} '
+                'FROM import_stage ON CONFLICT DO NOTHING'.format(
+                    table=qualified_name(model), columns=column_list))
+            count = cursor.rowcount
+            # внутри внешней транзакции ON COMMIT DROP не сработает
+            cursor.execute('DROP TABLE import_stage')
+            return count
+
+    @contextmanager
+    def _triggers_disabled(self, models):
+        if not self.offline:
+            yield
+            return
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute('ALTER TABLE {} DISABLE TRIGGER USER'.format(
+                    qualified_name(model)))
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                for model in models:
+                    cursor.execute('ALTER TABLE {} ENABLE TRIGGER USER'.format(
+                        qualified_name(model)))
+
+    @contextmanager
+    def _indexes_dropped(self, models):
+        if not self.drop_indexes:
+            yield
+            return
+        definitions = []
+        with connection.cursor() as cursor:
+            for model in models:
+                cursor.execute(SECONDARY_INDEXES_SQL,
+                               [qualified_name(model)])
+                for schema, name, definition in cursor.fetchall():
+                    cursor.execute('DROP INDEX "{}"."{}"'.format(schema, name))
+                    definitions.append(definition)
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                for definition in definitions:
+                    self.log(definition)
+                    cursor.execute(definition)
+
+    def _finish(self, models) -> None:
+        with connection.cursor() as cursor:
+            # без offline модель чтения обновили триггеры по пачкам
+            if self.offline:
+                cursor.execute(
+                    "SELECT to_regprocedure("
+                    "'content.refresh_film_work_read(uuid[])') IS NOT NULL")
+                if cursor.fetchone()[0]:
+                    self.log('refreshing content.film_work_read')
+                    cursor.execute(
+                        'SELECT content.refresh_film_work_read(NULL)')
+            # свежая статистика нужна планировщику и оценкам числа строк
+            for model in models:
+                cursor.execute('ANALYZE {}'.format(qualified_name(model)))
+        # существующие строки не меняются, сбрасываются только списки
+        invalidate_films([])
@@ -0,0 +1,163 @@
+import csv
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+
+from movies.models import FilmType, PersonRole
+
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime',
+    'Documentary', 'Drama', 'Family', 'Fantasy', 'History', 'Horror',
+    'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport', 'Thriller',
+    'War', 'Western',
+)
+FIRST_NAMES = (
+    'Anna', 'Boris', 'Chris', 'Daria', 'Emma', 'Fedor', 'George', 'Helen',
+    'Ivan', 'Julia', 'Kevin', 'Laura', 'Mark', 'Nina', 'Oleg', 'Paula',
+    'Roman', 'Sofia', 'Tom', 'Vera', 'William', 'Yana', 'Zoe',
+)
+LAST_NAMES = (
+    'Adams', 'Baker', 'Clark', 'Davis', 'Evans', 'Frolov', 'Green', 'Hill',
+    'Ivanov', 'Jones', 'King', 'Lee', 'Miller', 'Nolan', 'Orlov', 'Petrov',
+    'Quinn', 'Reed', 'Smith', 'Turner', 'Volkov', 'White', 'Young',
+)
+TITLE_WORDS = (
+    'Star', 'Night', 'Return', 'Last', 'Dark', 'City', 'Love', 'War',
+    'Secret', 'Lost', 'Empire', 'Shadow', 'Storm', 'River', 'Dream', 'Fire',
+    'Ghost', 'Winter', 'Road', 'Kingdom', 'Island', 'Silent', 'Wild', 'Gold',
+)
+FILM_TYPES = (FilmType.TV_SERIES.value, FilmType.MOVIE.value)
+START_DATE = date(1920, 1, 1)
+DATE_RANGE = (date(2022, 1, 1) - START_DATE).days
+LOW_BITS = 62
+LOW_MASK = (1 << LOW_BITS) - 1
+# нечётный множитель - перестановка младших бит, id не идут по порядку
+SCRAMBLE = 0x9E3779B97F4A7C15
+
+
+class IdSequence:
+    """Детерминированные UUIDv4 без хранения: i-й id вычисляется по номеру"""
+
+    def __init__(self, rng: random.Random):
+        self.prefix = rng.getrandbits(64) << 64
+
+    def __call__(self, number: int) -> str:
+        low = (number * SCRAMBLE) & LOW_MASK
+        return str(uuid.UUID(int=self.prefix | low, version=4))
+
+
+class CatalogGenerator:
+    """
+    Синтетический каталог для нагрузочных тестов: CSV файлы в формате
+    import_catalog. Популярность персон распределена по закону Ципфа,
+    поэтому у части персон тысячи фильмов, как в реальных данных.
+    """
+
+    def __init__(self, films: int, persons: int, cast_per_film: int = 10,
+                 seed: int = 0):
+        self.films = films
+        self.persons = max(persons, 1)
+        self.cast_per_film = max(cast_per_film, 1)
+        self.rng = random.Random(seed)
+        self.now = datetime.now(timezone.utc).isoformat()
+        self.film_id = IdSequence(self.rng)
+        self.person_id = IdSequence(self.rng)
+        self.genre_id = IdSequence(self.rng)
+        self.link_id = IdSequence(self.rng)
+        self.links = 0
+
+    def write(self, directory: str) -> dict:
+        os.makedirs(directory, exist_ok=True)
+        counts = {
+            'genre': self._write(directory, 'genre',
+                                 ('id', 'name', 'description', 'created',
+                                  'modified'),
+                                 self.genre_rows()),
+            'person': self._write(directory, 'person',
+                                  ('id', 'full_name', 'created', 'modified'),
+                                  self.person_rows()),
+        }
+        with self._open(directory, 'genre_film_work') as genres_file, \
+                self._open(directory, 'person_film_work') as persons_file:
+            genres = csv.writer(genres_file)
+            genres.writerow(('id', 'film_work_id', 'genre_id', 'created'))
+            persons = csv.writer(persons_file)
+            persons.writerow(('id', 'film_work_id', 'person_id', 'role',
+                              'created'))
+            counts['film_work'] = self._write(
+                directory, 'film_work',
+                ('id', 'title', 'description', 'creation_date', 'rating',
+                 'type', 'created', 'modified'),
+                self.film_rows(genres, persons))
+        counts['links'] = self.links
+        return counts
+
+    @staticmethod
+    def _open(directory: str, table: str):
+        return open(os.path.join(directory, table + '.csv'), 'w',
+                    newline='', encoding='utf-8')
+
+    def _write(self, directory: str, table: str, header, rows) -> int:
+        count = 0
+        with self._open(directory, table) as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+    def genre_rows(self):
+        for number, name in enumerate(GENRES):
+            yield (self.genre_id(number), name, '{} films'.format(name),
+                   self.now, self.now)
+
+    def person_rows(self):
+        for number in range(self.persons):
+            yield (self.person_id(number), '{} {} {}'.format(
+                self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+                number), self.now, self.now)
+
+    def film_rows(self, genres, persons):
+        rng = self.rng
+        popularity = list(accumulate(
+            1 / (rank + 1) ** 0.8 for rank in range(self.persons)))
+        for number in range(self.films):
+            film_id = self.film_id(number)
+            words = rng.sample(TITLE_WORDS, rng.randint(1, 3))
+            yield (
+                film_id,
+                ' '.join(words),
+                ' '.join(rng.choices(TITLE_WORDS, k=20)).capitalize() + '.',
+                START_DATE + timedelta(days=rng.randrange(DATE_RANGE)),
+                round(rng.uniform(1, 10), 1),
+                FILM_TYPES[rng.random() < 0.8],
+                self.now, self.now,
+            )
+            for genre in rng.sample(range(len(GENRES)), rng.randint(1, 3)):
+                genres.writerow((self._next_link(), film_id,
+                                 self.genre_id(genre), self.now))
+
+            size = rng.randint(self.cast_per_film // 2 + 1,
+                               self.cast_per_film * 3 // 2 + 1)
+            cast = set()
+            for position, person in enumerate(rng.choices(
+                    range(self.persons), cum_weights=popularity, k=size)):
+                if position == 0:
+                    role = PersonRole.DIRECTOR
+                elif position < 3:
+                    role = PersonRole.PRODUCER
+                else:
+                    role = PersonRole.ACTOR
+                if (person, role) in cast:
+                    continue
+                cast.add((person, role))
+                persons.writerow((self._next_link(), film_id,
+                                  self.person_id(person), role.value,
+                                  self.now))
+
+    def _next_link(self) -> str:
+        self.links += 1
+        return self.link_id(self.links)
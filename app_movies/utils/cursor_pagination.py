@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+import uuid
+
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.db import connection
+from django.db.models import BooleanField, Expression, F, Value
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise BadRequest('invalid cursor')
+    if not isinstance(data, dict) or not {'k', 'id', 'd'} <= data.keys():
+        raise BadRequest('invalid cursor')
+    # значения уходят в запрос: неверный тип дал бы ошибку postgres
+    if not isinstance(data['k'], str) or not isinstance(data['id'], str) \
+            or data['d'] not in ('prev', 'next'):
+        raise BadRequest('invalid cursor')
+    try:
+        uuid.UUID(data['id'])
+    except ValueError:
+        raise BadRequest('invalid cursor')
+    return data
+
+
+class RowCompare(Expression):
+    """
+    Сравнение строк (a, b) > (x, y): PostgreSQL выполняет его одним
+    диапазоном по составному индексу (a, b), в отличие от условия
+    a > x OR (a = x AND b > y).
+    """
+    output_field = BooleanField()
+
+    def __init__(self, fields, op: str, values):
+        super().__init__()
+        self.op = op
+        self.left = [F(field) for field in fields]
+        self.right = [Value(value) for value in values]
+
+    def get_source_expressions(self):
+        return self.left + self.right
+
+    def set_source_expressions(self, exprs):
+        self.left, self.right = exprs[:len(self.left)], exprs[len(self.left):]
+
+    def as_sql(self, compiler, connection):
+        parts, params = [], []
+        for side in (self.left, self.right):
+            sqls = []
+            for expr in side:
+                sql, expr_params = compiler.compile(expr)
+                sqls.append(sql)
+                params.extend(expr_params)
+            parts.append('({})'.format(', '.join(sqls)))
+        return '{} {} {}'.format(parts[0], self.op, parts[1]), params
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (keyset): страница выбирается условием
+    по (key, id) последней показанной записи, без OFFSET и COUNT(*).
+    Курсор непрозрачен для клиента и содержит ключ сортировки, id и
+    направление.
+    """
+
+    def __init__(self, queryset, per_page: int, key: str = 'title'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+
+    def page(self, token: str = None) -> dict:
+        cursor = decode_cursor(token) if token else None
+        return self._build_page(cursor, list(self._page_queryset(cursor)))
+
+    async def apage(self, token: str = None) -> dict:
+        cursor = decode_cursor(token) if token else None
+        rows = [row async for row in self._page_queryset(cursor)]
+        return self._build_page(cursor, rows)
+
+    def _page_queryset(self, cursor: dict = None):
+        backwards = bool(cursor) and cursor['d'] == 'prev'
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(RowCompare(
+                (self.key, 'id'), '<' if backwards else '>',
+                (cursor['k'], cursor['id'])))
+        ordering = (self.key, 'id')
+        if backwards:
+            ordering = tuple('-' + field for field in ordering)
+        return queryset.order_by(*ordering)[:self.per_page + 1]
+
+    def _build_page(self, cursor: dict, rows: list) -> dict:
+        backwards = bool(cursor) and cursor['d'] == 'prev'
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        has_next = has_more if not backwards else True
+        has_prev = has_more if backwards else bool(cursor)
+        return {
+            'prev': self._token(rows[0], 'prev')
+            if rows and has_prev else None,
+            'next': self._token(rows[-1], 'next')
+            if rows and has_next else None,
+            'results': rows,
+        }
+
+    def _token(self, row: dict, direction: str) -> str:
+        return encode_cursor({'k': row[self.key], 'id': str(row['id']),
+                              'd': direction})
+
+
+def estimated_count(model) -> int:
+    """Оценка числа строк таблицы по статистике планировщика"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table.replace('"', '')]
+        )
+        row = cursor.fetchone()
+    return max(row[0], 0) if row else 0
+
+
+def cached_count(queryset, key: str) -> int:
+    return cache.get_or_set(key, queryset.count, COUNT_CACHE_TIMEOUT)
+
+
+async def acached_count(queryset, key: str) -> int:
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, COUNT_CACHE_TIMEOUT)
+    return count
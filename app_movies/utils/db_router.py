@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from itertools import count
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+RECENT_WRITE_KEY = 'movies:db:recent_write'
+
+LAG_SQL = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE coalesce(extract(epoch FROM now() - "
+    "pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaPool:
+    """
+    Реплики из settings.DATABASE_REPLICAS с проверкой доступности и
+    отставания. Результат проверки кэшируется на REPLICA_CHECK_INTERVAL
+    секунд, реплики выбираются по кругу.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._counter = count()
+
+    def is_healthy(self, alias: str) -> bool:
+        now = time.monotonic()
+        checked_at, healthy = self._checked.get(alias, (None, False))
+        if checked_at is not None and \
+                now - checked_at < settings.REPLICA_CHECK_INTERVAL:
+            return healthy
+        with self._lock:
+            if alias in self._probing:
+                # реплику уже проверяет другой поток, до конца проверки
+                # действует прежний результат
+                return healthy
+            self._probing.add(alias)
+        try:
+            healthy = self._check(alias)
+        finally:
+            with self._lock:
+                self._probing.discard(alias)
+                self._checked[alias] = (time.monotonic(), healthy)
+        return healthy
+
+    @staticmethod
+    def _check(alias: str) -> bool:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError as e:
+            logger.warning('replica %s is unavailable: %s', alias, e)
+            return False
+        if lag > settings.REPLICA_MAX_LAG:
+            logger.warning('replica %s lags %.1fs behind', alias, lag)
+            return False
+        return True
+
+    def choose(self):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            return None
+        start = next(self._counter)
+        for shift in range(len(replicas)):
+            alias = replicas[(start + shift) % len(replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+
+replica_pool = ReplicaPool()
+
+
+def mark_written() -> None:
+    """
+    Отметить запись в основную базу: пока реплика может её не видеть,
+    API читает с основной базы. Иначе устаревший ответ реплики попал бы в
+    кэш API уже под новой версией. Отставание проверяется раз в
+    REPLICA_CHECK_INTERVAL, поэтому он добавляется к REPLICA_MAX_LAG.
+    """
+    cache.set(RECENT_WRITE_KEY, True,
+              settings.REPLICA_MAX_LAG + settings.REPLICA_CHECK_INTERVAL)
+
+
+class ReplicaRouter:
+    """
+    Чтение в рамках запросов к API (ReplicaRoutingMiddleware) идёт на
+    исправную реплику, всё остальное, включая админку, - на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return 'default'
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return replica_pool.choose() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _use_replica(self, request) -> bool:
+        return bool(settings.DATABASE_REPLICAS) and \
+            request.method in ('GET', 'HEAD') and \
+            request.path.startswith(tuple(settings.REPLICA_ROUTED_PATHS))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        use_replica = self._use_replica(request) and \
+            not cache.get(RECENT_WRITE_KEY)
+        token = _read_from_replica.set(use_replica)
+        try:
+            return self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+
+    async def __acall__(self, request):
+        use_replica = self._use_replica(request) and \
+            not await cache.aget(RECENT_WRITE_KEY)
+        token = _read_from_replica.set(use_replica)
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from elasticsearch import Elasticsearch
+
+from utils.cursor_pagination import decode_cursor, encode_cursor
+
+SEARCH_FIELDS = (
+    'title^3',
+    'description',
+    'genres_names',
+    'actors_names',
+    'directors_names',
+    'writers_names',
+)
+RESULT_FIELDS = (
+    'id',
+    'title',
+    'description',
+    'imdb_rating',
+    'genres_names',
+    'actors_names',
+    'directors_names',
+    'writers_names',
+)
+SORTS = {
+    'relevance': ['_score', {'id': 'asc'}],
+    'rating': [{'imdb_rating': 'asc'}, {'id': 'asc'}],
+    '-rating': [{'imdb_rating': 'desc'}, {'id': 'asc'}],
+}
+
+
+@lru_cache()
+def get_client() -> Elasticsearch:
+    return Elasticsearch(**settings.ELASTIC_DSL)
+
+
+def film_ids_lookup(index: str, doc_id: str) -> dict:
+    # фильмы персоны или жанра берутся из film_ids их документа
+    return {'terms': {'id': {'index': index, 'id': doc_id,
+                             'path': 'film_ids'}}}
+
+
+def search_movies(query: str = None, genres=(), persons=(),
+                  sort: str = 'relevance', after: str = None,
+                  size: int = 50) -> dict:
+    """
+    Поиск фильмов в индексе movies. Фильтры по жанрам и персонам
+    используют индексы genres и persons, страницы выбираются через
+    search_after по курсору из предыдущего ответа.
+    """
+    if query:
+        must = [{'multi_match': {'query': query, 'fields': SEARCH_FIELDS}}]
+    else:
+        must = [{'match_all': {}}]
+    filters = [film_ids_lookup(settings.ELASTIC_GENRES_INDEX, genre_id)
+               for genre_id in genres]
+    filters += [film_ids_lookup(settings.ELASTIC_PERSONS_INDEX, person_id)
+                for person_id in persons]
+
+    params = {
+        'index': settings.ELASTIC_MOVIES_INDEX,
+        'query': {'bool': {'must': must, 'filter': filters}},
+        'sort': SORTS[sort],
+        'size': size,
+        'source': list(RESULT_FIELDS),
+    }
+    if after:
+        search_after = decode_cursor(after)['k']
+        if not isinstance(search_after, list) or \
+                len(search_after) != len(SORTS[sort]) or \
+                not all(isinstance(value, (str, int, float))
+                        for value in search_after):
+            raise BadRequest('invalid cursor')
+        params['search_after'] = search_after
+
+    response = get_client().search(**params)
+    hits = response['hits']['hits']
+    next_token = None
+    if len(hits) == size:
+        next_token = encode_cursor({'k': hits[-1]['sort'],
+                                    'id': hits[-1]['_id'], 'd': 'next'})
+    return {
+        'count': response['hits']['total']['value'],
+        'next': next_token,
+        'results': [hit['_source'] for hit in hits],
+    }
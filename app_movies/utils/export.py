@@ -0,0 +1,68 @@
+import zlib
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+# сколько строк собирается в один кусок ответа
+EXPORT_BATCH_SIZE = 500
+
+
+def _encoder() -> DjangoJSONEncoder:
+    return DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _chunk(lines: list) -> bytes:
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def _compressor():
+    return zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+
+def ndjson_stream(rows: Iterable[dict],
+                  batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    encoder = _encoder()
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(row))
+        if len(batch) >= batch_size:
+            yield _chunk(batch)
+            batch = []
+    if batch:
+        yield _chunk(batch)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = _compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+async def andjson_stream(rows: AsyncIterable[dict],
+                         batch_size: int = EXPORT_BATCH_SIZE
+                         ) -> AsyncIterator[bytes]:
+    """
+    То же для ASGI: синхронный итератор StreamingHttpResponse под ASGI
+    прочитал бы весь каталог в память до отправки.
+    """
+    encoder = _encoder()
+    batch = []
+    async for row in rows:
+        batch.append(encoder.encode(row))
+        if len(batch) >= batch_size:
+            yield _chunk(batch)
+            batch = []
+    if batch:
+        yield _chunk(batch)
+
+
+async def agzip_stream(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    compressor = _compressor()
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,48 @@
+from typing import Callable, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+FRAGMENT_KEY = 'movies:api:fragment:{}:{}'
+
+encoder = DjangoJSONEncoder(separators=(', ', ': '))
+
+
+def fragment_key(row: dict) -> str:
+    return FRAGMENT_KEY.format(row['id'], row['modified'].timestamp()
+                               if row['modified'] else 0)
+
+
+def film_fragments(rows: List[dict],
+                   load: Callable[[List], Iterable[dict]]) -> List[bytes]:
+    """
+    JSON каждого фильма страницы, закодированный заранее. rows содержат
+    id и modified фильмов, load(ids) возвращает полные данные фильмов,
+    которых нет в кэше; кодируются только они.
+    """
+    keys = [fragment_key(row) for row in rows]
+    fragments = cache.get_many(keys)
+
+    missing = {row['id']: key for row, key in zip(rows, keys)
+               if key not in fragments}
+    if missing:
+        encoded = {missing[film['id']]: encoder.encode(film).encode()
+                   for film in load(list(missing))}
+        cache.set_many(encoded, settings.MOVIES_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(encoded)
+    return [fragments[key] for key in keys if key in fragments]
+
+
+def fragment_response(context: dict, fragments: List[bytes]) -> HttpResponse:
+    """Ответ из конверта context и готовых фрагментов вместо results"""
+    envelope = encoder.encode(
+        {key: value for key, value in context.items() if key != 'results'}
+    ).encode()
+    results = b'"results": [' + b', '.join(fragments) + b']'
+    if envelope == b'{}':
+        body = b'{' + results + b'}'
+    else:
+        body = envelope[:-1] + b', ' + results + b'}'
+    return HttpResponse(body, content_type='application/json')
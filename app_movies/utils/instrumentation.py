@@ -0,0 +1,361 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_request_stats = ContextVar('request_stats', default=None)
+
+_SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_PLACEHOLDERS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_SQL_SPACES = re.compile(r'\s+')
+
+
+def sql_fingerprint(sql: str):
+    """
+    Нормализованный SQL без значений и длины списков IN (...) и его
+    короткий хэш: запросы, отличающиеся только параметрами, совпадают.
+    """
+    normalized = _SQL_LITERAL.sub('?', sql)
+    normalized = _SQL_PLACEHOLDERS.sub('(...)', normalized)
+    normalized = _SQL_SPACES.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+
+    def merge(self, counts: list, total: float) -> None:
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.total += total
+
+    def render(self, name: str, labels: str) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                name, labels, bound, cumulative))
+        lines.append('{}_sum{{{}}} {}'.format(name, labels, self.total))
+        lines.append('{}_count{{{}}} {}'.format(name, labels, cumulative))
+        return lines
+
+
+class Registry:
+    """
+    Метрики в текстовом формате Prometheus. Воркеры gunicorn делят один
+    сокет, и /metrics отвечает любой из них, поэтому при заданном
+    INSTRUMENTATION_METRICS_DIR каждый процесс раз в
+    INSTRUMENTATION_FLUSH_INTERVAL секунд сохраняет свои метрики в файл
+    <pid>.json, а render складывает файлы всех процессов. Счётчики и
+    гистограммы завершившихся процессов сохраняются, датчики (gauge)
+    складываются только по работающим.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(Counter)
+        self.gauges = defaultdict(dict)
+
+    def _start(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # метрики родителя после fork не повторяются в воркере
+                self._reset()
+            self._pid = os.getpid()
+        if settings.INSTRUMENTATION_METRICS_DIR:
+            threading.Thread(target=self._flush_loop, daemon=True,
+                             name='metrics-flush').start()
+
+    def observe(self, name: str, labels: tuple, value: float,
+                buckets=SECONDS_BUCKETS) -> None:
+        self._start()
+        with self._lock:
+            histogram = self.histograms[name].get(labels)
+            if histogram is None:
+                histogram = self.histograms[name][labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, labels: tuple, value: int = 1) -> None:
+        self._start()
+        with self._lock:
+            self.counters[name][labels] += value
+
+    def set(self, name: str, labels: tuple, value: float) -> None:
+        self._start()
+        with self._lock:
+            self.gauges[name][labels] = value
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(settings.INSTRUMENTATION_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error('не удалось сохранить метрики: %s', e)
+
+    def flush(self) -> None:
+        """Сохранить метрики процесса в общий каталог"""
+        with self._lock:
+            data = {
+                'histograms': [
+                    [name, labels, histogram.buckets, histogram.counts,
+                     histogram.total]
+                    for name, series in self.histograms.items()
+                    for labels, histogram in series.items()],
+                'counters': [[name, labels, value]
+                             for name, series in self.counters.items()
+                             for labels, value in series.items()],
+                'gauges': [[name, labels, value]
+                           for name, series in self.gauges.items()
+                           for labels, value in series.items()],
+            }
+        path = os.path.join(settings.INSTRUMENTATION_METRICS_DIR,
+                            '{}.json'.format(os.getpid()))
+        with open(path + '.tmp', 'w') as file:
+            json.dump(data, file)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @classmethod
+    def _merge(cls, directory: str) -> tuple:
+        histograms = defaultdict(dict)
+        counters = defaultdict(Counter)
+        gauges = defaultdict(dict)
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, buckets, counts, total in data['histograms']:
+                labels = tuple(map(tuple, labels))
+                histogram = histograms[name].get(labels)
+                if histogram is None:
+                    histogram = histograms[name][labels] = Histogram(
+                        tuple(buckets))
+                histogram.merge(counts, total)
+            for name, labels, value in data['counters']:
+                counters[name][tuple(map(tuple, labels))] += value
+            pid = int(os.path.basename(path).split('.')[0])
+            if not cls._alive(pid):
+                continue
+            for name, labels, value in data['gauges']:
+                labels = tuple(map(tuple, labels))
+                gauges[name][labels] = gauges[name].get(labels, 0) + value
+        return histograms, counters, gauges
+
+    @staticmethod
+    def _labels(labels: tuple) -> str:
+        return ','.join('{}="{}"'.format(key, str(value).replace('"', '\\"'))
+                        for key, value in labels)
+
+    def render(self) -> str:
+        directory = settings.INSTRUMENTATION_METRICS_DIR
+        if directory:
+            self.flush()
+            return self._render(*self._merge(directory))
+        with self._lock:
+            return self._render(self.histograms, self.counters, self.gauges)
+
+    @classmethod
+    def _render(cls, histograms, counters, gauges) -> str:
+        lines = []
+        for name, series in sorted(histograms.items()):
+            lines.append('# TYPE {} histogram'.format(name))
+            for labels, histogram in series.items():
+                lines.extend(histogram.render(name, cls._labels(labels)))
+        for name, series in sorted(counters.items()):
+            lines.append('# TYPE {} counter'.format(name))
+            for labels, value in series.items():
+                lines.append('{}{{{}}} {}'.format(
+                    name, cls._labels(labels), value))
+        for name, series in sorted(gauges.items()):
+            lines.append('# TYPE {} gauge'.format(name))
+            for labels, value in series.items():
+                lines.append('{}{{{}}} {}'.format(
+                    name, cls._labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """Запросы к базе и этапы обработки одного HTTP запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = defaultdict(float)
+        self.fingerprints = Counter()
+        self.sql = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            fingerprint, normalized = sql_fingerprint(sql)
+            self.queries += 1
+            self.db_time += duration
+            self.fingerprints[fingerprint] += 1
+            self.sql.setdefault(fingerprint, normalized)
+            if duration * 1000 >= settings.INSTRUMENTATION_SLOW_QUERY_MS:
+                self.slow.append((fingerprint, duration))
+
+
+@contextmanager
+def timing(name: str):
+    """Замер этапа запроса (например render) для метрик и Server-Timing"""
+    stats = _request_stats.get()
+    if stats is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stats.timings[name] += perf_counter() - start
+
+
+class InstrumentationMiddleware:
+    """
+    Гистограммы длительности запросов по маршрутам с разбивкой на время
+    в базе, число запросов и отрисовку ответа. Медленные запросы и
+    повторы одного запроса (N+1) логируются с отпечатком SQL и
+    считаются в метриках. При INSTRUMENTATION_SERVER_TIMING добавляет
+    заголовок Server-Timing.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, start, token = self._start()
+        try:
+            with self._wrapped(stats):
+                response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, start, token = self._start()
+        try:
+            with self._wrapped(stats):
+                response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self._finish(request, response, stats, start)
+
+    @staticmethod
+    def _start():
+        stats = RequestStats()
+        return stats, perf_counter(), _request_stats.set(stats)
+
+    @staticmethod
+    @contextmanager
+    def _wrapped(stats: RequestStats):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            yield
+
+    def _finish(self, request, response, stats: RequestStats, start: float):
+        total = perf_counter() - start
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+        labels = (('route', route), ('method', request.method))
+
+        registry.observe('movies_request_seconds', labels, total)
+        registry.observe('movies_request_db_seconds', labels, stats.db_time)
+        registry.observe('movies_request_queries', labels, stats.queries,
+                         QUERIES_BUCKETS)
+        for name, duration in stats.timings.items():
+            registry.observe('movies_request_{}_seconds'.format(name),
+                             labels, duration)
+
+        for fingerprint, duration in stats.slow:
+            registry.inc('movies_slow_queries_total',
+                         (('route', route), ('fingerprint', fingerprint)))
+            logger.warning('медленный запрос %.1fms [%s] %s: %s',
+                           duration * 1000, fingerprint, route,
+                           stats.sql[fingerprint])
+        for fingerprint, count in stats.fingerprints.items():
+            if count >= settings.INSTRUMENTATION_N_PLUS_ONE:
+                registry.inc('movies_n_plus_one_total',
+                             (('route', route), ('fingerprint', fingerprint)))
+                logger.warning('возможный N+1: %d повторов [%s] %s: %s',
+                               count, fingerprint, route,
+                               stats.sql[fingerprint])
+
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            parts = ['db;dur={:.1f};desc="{} queries"'.format(
+                stats.db_time * 1000, stats.queries)]
+            parts += ['{};dur={:.1f}'.format(name, duration * 1000)
+                      for name, duration in stats.timings.items()]
+            parts.append('total;dur={:.1f}'.format(total * 1000))
+            response['Server-Timing'] = ', '.join(parts)
+        return response
+
+
+def metrics_view(request):
+    if not settings.INSTRUMENTATION:
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
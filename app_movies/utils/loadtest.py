@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from typing import Dict, Iterable, List
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, build_opener
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values: List[float], p: int) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run_load(base_url: str, paths: Iterable[str], concurrency: int = 10,
+             duration: float = 10, timeout: float = 30,
+             headers: Dict[str, str] = None, opener=None) -> Dict[str, dict]:
+    """
+    Нагрузка на base_url: concurrency клиентов в течение duration секунд
+    по кругу запрашивают paths. Возвращает по каждому пути количество
+    запросов, ошибок, пропускную способность и перцентили задержки (мс).
+    """
+    paths = list(paths)
+    opener = opener or build_opener()
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset: int):
+        # клиенты начинают с разных путей, чтобы нагрузка была равномерной
+        for path in cycle(paths[offset % len(paths):] +
+                          paths[:offset % len(paths)]):
+            if time.monotonic() >= deadline:
+                return
+            request = Request(base_url.rstrip('/') + path,
+                              headers=headers or {})
+            started = time.perf_counter()
+            failed = False
+            try:
+                with opener.open(request, timeout=timeout) as response:
+                    response.read()
+            except (HTTPError, URLError, OSError):
+                failed = True
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if failed:
+                    errors[path] += 1
+                else:
+                    latencies[path].append(elapsed)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for offset in range(concurrency):
+            executor.submit(worker, offset)
+    elapsed = time.monotonic() - started
+
+    report = {}
+    for path in paths:
+        values = latencies[path]
+        report[path] = {
+            'requests': len(values),
+            'errors': errors[path],
+            'rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+            **{'p{}'.format(p): round(percentile(values, p), 1)
+               for p in PERCENTILES},
+        }
+    return report
+
+
+def format_report(report: Dict[str, dict]) -> str:
+    header = '{:<50} {:>8} {:>7} {:>8} {:>8} {:>8} {:>8}'.format(
+        'path', 'requests', 'errors', 'rps', 'p50', 'p95', 'p99')
+    lines = [header]
+    for path, row in report.items():
+        lines.append('{:<50} {:>8} {:>7} {:>8} {:>8} {:>8} {:>8}'.format(
+            path[:50], row['requests'], row['errors'], row['rps'],
+            row['p50'], row['p95'], row['p99']))
+    return '\n'.join(lines)
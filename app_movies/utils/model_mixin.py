@@ -1,9 +1,28 @@
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.exceptions import BadRequest
 from django.db.models import Q
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 
-from config.settings import MOVIES_PAGE_PAGINATE_BY
-from movies.models import FilmWork, PersonRole
+from config.settings import (MOVIES_FRAGMENT_CACHE, MOVIES_PAGE_PAGINATE_BY,
+                             MOVIES_READ_MODEL)
+from movies.models import FilmWork, FilmWorkRead, PersonRole
+from utils.fragment_cache import film_fragments, fragment_response
+from utils.instrumentation import timing
+
+FILM_FIELDS = (
+    'id',
+    'title',
+    'description',
+    'creation_date',
+    'rating',
+    'type',
+)
+RELATION_FIELDS = ('genres', 'actors', 'directors', 'writers')
+PERSON_ROLES = {
+    'actors': PersonRole.ACTOR,
+    'directors': PersonRole.DIRECTOR,
+    'writers': PersonRole.PRODUCER,
+}
 
 
 class MoviesApiMixin:
@@ -19,24 +38,86 @@ class MoviesApiMixin:
             filter=Q(personfilmwork__role=role)
         )
 
+    def _get_param_list(self, name):
+        value = self.request.GET.get(name)
+        if value is None:
+            return None
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def get_fields(self) -> tuple:
+        """
+        Поля ответа: ?fields= задаёт колонки фильма (и связи), ?expand=
+        добавляет связи. Без параметров возвращаются все поля. id есть
+        всегда, title - при постраничном выводе по курсору.
+        """
+        fields = self._get_param_list('fields')
+        expand = self._get_param_list('expand')
+        if fields is None and expand is None:
+            return FILM_FIELDS + RELATION_FIELDS
+
+        if fields is None:
+            fields = list(FILM_FIELDS)
+        expand = expand or []
+        unknown = set(fields) - set(FILM_FIELDS + RELATION_FIELDS)
+        unknown |= set(expand) - set(RELATION_FIELDS)
+        if unknown:
+            raise BadRequest('unknown fields: {}'.format(
+                ', '.join(sorted(unknown))))
+
+        selected = {'id', *fields, *expand}
+        if 'cursor' in self.request.GET:
+            selected.add('title')
+        return tuple(field for field in FILM_FIELDS + RELATION_FIELDS
+                     if field in selected)
+
+    def use_fragments(self) -> bool:
+        """Полное представление фильмов собирается из кэша фрагментов"""
+        return (MOVIES_FRAGMENT_CACHE and MOVIES_READ_MODEL
+                and 'fields' not in self.request.GET
+                and 'expand' not in self.request.GET)
+
     def get_queryset(self):
+        if self.use_fragments():
+            # достаточно ключей фрагментов и ключа сортировки курсора
+            return FilmWorkRead.objects.values('id', 'title', 'modified')
+
+        fields = self.get_fields()
+        film_fields = [field for field in fields if field in FILM_FIELDS]
+        relations = [field for field in fields if field in RELATION_FIELDS]
+
+        if MOVIES_READ_MODEL:
+            # одна строка на фильм, без соединений и агрегации
+            return FilmWorkRead.objects.values(*film_fields, *relations)
+
+        # соединения строятся только для запрошенных связей
         queryset = super().get_queryset()
-        queryset = queryset.prefetch_related('genres', 'persons')
-        queryset = queryset.values(
-            'id',
-            'title',
-            'description',
-            'creation_date',
-            'rating',
-            'type'
-        )
-        queryset = queryset.annotate(
-            genres=ArrayAgg('genrefilmwork__genre_id__name', distinct=True),
-            actors=self.__person_in_role(PersonRole.ACTOR),
-            directors=self.__person_in_role(PersonRole.DIRECTOR),
-            writers=self.__person_in_role(PersonRole.PRODUCER),
-        )
+        queryset = queryset.values(*film_fields)
+        annotations = {name: self.__relation(name) for name in relations}
+        if annotations:
+            queryset = queryset.annotate(**annotations)
         return queryset
 
+    def __relation(self, name):
+        if name == 'genres':
+            return ArrayAgg('genrefilmwork__genre_id__name', distinct=True)
+        return self.__person_in_role(PERSON_ROLES[name])
+
+    def load_films(self, ids):
+        return FilmWorkRead.objects.filter(id__in=ids).values(
+            *FILM_FIELDS, *RELATION_FIELDS)
+
     def render_to_response(self, context, **response_kwargs):
-        return JsonResponse(context)
+        with timing('render'):
+            return self._render(context)
+
+    def _render(self, context):
+        if not self.use_fragments():
+            return JsonResponse(context)
+        if 'results' in context:
+            fragments = film_fragments(context['results'], self.load_films)
+            return fragment_response(context, fragments)
+        # карточка фильма - один фрагмент без конверта
+        fragments = film_fragments([context], self.load_films)
+        if not fragments:
+            raise Http404('No film found matching the query')
+        return HttpResponse(fragments[0], content_type='application/json')
@@ -0,0 +1,56 @@
+import json
+import threading
+from functools import partial
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+
+from .pool import ConnectionPool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений процесса (settings_dict['POOL']). Django
+    закрывает соединение в конце каждого запроса - вместо закрытия оно
+    возвращается в пул, а следующий запрос получает уже подключенное.
+    Служебные соединения без базы (создание тестовой базы) идут мимо пула.
+    """
+    _connection_pool = None
+
+    def get_pool(self, conn_params: dict) -> ConnectionPool:
+        key = (self.alias, json.dumps(conn_params, sort_keys=True,
+                                      default=str))
+        pool = _pools.get(key)
+        if pool is None:
+            with _pools_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    options = {name.lower(): value for name, value in
+                               self.settings_dict.get('POOL', {}).items()}
+                    pool = _pools[key] = ConnectionPool(
+                        partial(super().get_new_connection, conn_params),
+                        self.alias, **options)
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if self.alias == NO_DB_ALIAS:
+            self._connection_pool = None
+            return super().get_new_connection(conn_params)
+        self._connection_pool = self.get_pool(conn_params)
+        return self._connection_pool.getconn()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self._connection_pool
+        with self.wrap_database_errors:
+            if pool is None:
+                return self.connection.close()
+            if self.in_atomic_block:
+                # Django оставляет ссылку на соединение, закрытое внутри
+                # atomic, поэтому вернуть его в пул нельзя
+                return pool.discard(self.connection)
+            return pool.putconn(self.connection)
@@ -0,0 +1,258 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from time import perf_counter
+
+from psycopg2 import OperationalError, extensions
+
+from utils.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'expires', 'released')
+
+    def __init__(self, connection, max_lifetime: float):
+        self.connection = connection
+        # разброс срока жизни, чтобы соединения не переоткрывались разом
+        self.expires = time.monotonic() + max_lifetime * random.uniform(
+            0.9, 1.0)
+        self.released = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Ограниченный пул соединений процесса. Соединение проверяется при
+    выдаче: закрытые и просроченные (max_lifetime) отбрасываются, а
+    простоявшее дольше check_interval проверяется запросом SELECT 1.
+    Свободные соединения сверх min_size закрываются после max_idle
+    секунд простоя; заранее соединения не открываются, min_size только
+    защищает их от закрытия по простою. Если все max_size соединений
+    заняты, ожидание ограничено timeout.
+
+    Под блокировкой выполняется только учёт: подключение, проверка,
+    сброс и закрытие соединения идут вне её, поэтому медленная база не
+    останавливает выдачу и возврат остальных соединений.
+    """
+
+    def __init__(self, connect, alias: str, min_size: int = 0,
+                 max_size: int = 4, max_lifetime: float = 1800,
+                 max_idle: float = 300, timeout: float = 10,
+                 check_interval: float = 5):
+        self.connect = connect
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._condition = threading.Condition()
+        self._reset()
+
+    def _reset(self) -> None:
+        # после fork соединения родителя не используются
+        self._pid = os.getpid()
+        self._idle = deque()
+        self._entries = {}
+        self._in_use = 0
+        self._opening = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    def getconn(self):
+        start = perf_counter()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = self._reserve(deadline)
+            if entry is None:
+                entry = self._open()
+                break
+            reason = self._check(entry)
+            if reason is None:
+                self._event('reused')
+                break
+            self._drop(entry, reason)
+        registry.observe('movies_db_pool_checkout_seconds',
+                         (('alias', self.alias),), perf_counter() - start,
+                         CHECKOUT_BUCKETS)
+        return entry.connection
+
+    def putconn(self, connection) -> None:
+        entry = self._entries.get(id(connection))
+        if entry is None or self._pid != os.getpid():
+            connection.close()
+            return
+        if not self._clean(connection):
+            self._drop(entry, 'broken')
+        elif time.monotonic() >= entry.expires:
+            self._drop(entry, 'lifetime')
+        else:
+            with self._condition:
+                self._in_use -= 1
+                entry.released = time.monotonic()
+                self._idle.append(entry)
+                stale = self._take_stale()
+                self._gauges()
+                self._condition.notify()
+            for stale_entry in stale:
+                self._close(stale_entry, 'idle')
+
+    def discard(self, connection) -> None:
+        """Закрыть выданное соединение, не возвращая его в пул"""
+        entry = self._entries.get(id(connection))
+        if entry is None:
+            connection.close()
+            return
+        self._drop(entry, 'discarded')
+
+    def close_all(self) -> None:
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            for entry in idle:
+                self._entries.pop(id(entry.connection), None)
+            self._gauges()
+        for entry in idle:
+            self._close(entry, 'shutdown')
+
+    def _reserve(self, deadline: float):
+        """
+        Свободное соединение (последнее возвращённое - самое "тёплое") или
+        None, если вместо него зарезервировано место под новое.
+        """
+        with self._condition:
+            if self._pid != os.getpid():
+                self._reset()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    self._in_use += 1
+                    self._gauges()
+                    return entry
+                if self.size + self._opening < self.max_size:
+                    self._opening += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._event('timeout')
+                    raise PoolTimeout(
+                        'pool {}: no free connection in {}s'.format(
+                            self.alias, self.timeout))
+                self._condition.wait(remaining)
+
+    def _open(self) -> _Entry:
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._condition:
+                self._opening -= 1
+                self._condition.notify()
+            raise
+        entry = _Entry(connection, self.max_lifetime)
+        with self._condition:
+            self._opening -= 1
+            self._entries[id(connection)] = entry
+            self._in_use += 1
+            self._gauges()
+        self._event('opened')
+        return entry
+
+    def _check(self, entry: _Entry):
+        """Причина отбросить выданное из пула соединение или None"""
+        now = time.monotonic()
+        if entry.connection.closed:
+            return 'closed'
+        if now >= entry.expires:
+            return 'lifetime'
+        if now - entry.released >= self.check_interval and \
+                not self._ping(entry.connection):
+            return 'broken'
+        return None
+
+    def _drop(self, entry: _Entry, reason: str) -> None:
+        """Убрать выданное соединение из пула и закрыть его"""
+        with self._condition:
+            self._entries.pop(id(entry.connection), None)
+            self._in_use -= 1
+            self._gauges()
+            self._condition.notify()
+        self._close(entry, reason)
+
+    def _close(self, entry: _Entry, reason: str) -> None:
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+        self._event('closed_{}'.format(reason))
+
+    def _take_stale(self) -> list:
+        """Свободные соединения сверх min_size, простоявшие max_idle"""
+        stale = []
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and \
+                now - self._idle[0].released >= self.max_idle:
+            entry = self._idle.popleft()
+            self._entries.pop(id(entry.connection), None)
+            stale.append(entry)
+        return stale
+
+    @staticmethod
+    def _ping(connection) -> bool:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not connection.autocommit:
+                connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning('соединение пула не отвечает: %s', e)
+            return False
+
+    @staticmethod
+    def _clean(connection) -> bool:
+        """
+        Вернуть соединение в исходное состояние: откатить транзакцию и
+        сбросить состояние сессии (курсоры WITH HOLD брошенной выгрузки,
+        временные таблицы, параметры SET). Параметры подключения (options)
+        DISCARD ALL не сбрасывает, часовой пояс django выставляет заново
+        при выдаче соединения.
+        """
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        autocommit = connection.autocommit
+        try:
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            # DISCARD ALL нельзя выполнить внутри транзакции
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute('DISCARD ALL')
+            connection.autocommit = autocommit
+        except Exception as e:
+            logger.warning('не удалось сбросить соединение пула: %s', e)
+            return False
+        return True
+
+    def _event(self, event: str) -> None:
+        registry.inc('movies_db_pool_events_total',
+                     (('alias', self.alias), ('event', event)))
+
+    def _gauges(self) -> None:
+        labels = (('alias', self.alias),)
+        registry.set('movies_db_pool_connections', labels, self.size)
+        registry.set('movies_db_pool_in_use', labels, self._in_use)
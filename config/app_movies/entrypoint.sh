@@ -2,20 +2,21 @@
 
 while ! nc -z $POSTGRES_HOST $POSTGRES_PORT; do sleep 1; done;
 
-python manage.py migrate movies 0001 --fake
-python manage.py migrate
-python manage.py createcachetable
-python manage.py compilemessages -l en -l ru
-python manage.py collectstatic  --noinput
-if [ "$DJANGO_SUPERUSER_USERNAME" ]
+python manage.py bootstrap --fixture /tmp/fixtures.json
+
+# метрики прошлого запуска: pid воркеров повторяются
+if [ -n "$INSTRUMENTATION_METRICS_DIR" ]
 then
-    python manage.py createsuperuser \
-        --noinput \
-        --username $DJANGO_SUPERUSER_USERNAME \
-        --email $DJANGO_SUPERUSER_EMAIL || true
+    rm -rf "$INSTRUMENTATION_METRICS_DIR"
+    mkdir -p "$INSTRUMENTATION_METRICS_DIR"
 fi
-python manage.py loaddata /tmp/fixtures.json
 
-gunicorn config.wsgi:application --bind 0.0.0.0:8000 --reload
+if [ "$MOVIES_API_ASYNC" = "True" ]
+then
+    gunicorn config.asgi:application --bind 0.0.0.0:8000 \
+        --worker-class uvicorn.workers.UvicornWorker
+else
+    gunicorn config.wsgi:application --bind 0.0.0.0:8000 --reload
+fi
 
 exec "$@"
\ No newline at end of file
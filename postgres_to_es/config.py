@@ -7,7 +7,22 @@ from dotenv import load_dotenv
 load_dotenv()
 CHUNK_SIZE = 100
 TUME_TO_RESTART = 60
+# бюджет времени одного цикла и веса очередей (пачек за проход)
+CYCLE_TIME_BUDGET = int(os.environ.get('ETL_CYCLE_TIME_BUDGET', 50))
+LANE_WEIGHTS = {
+    'films': int(os.environ.get('ETL_LANE_FILMS_WEIGHT', 4)),
+    'fanout': int(os.environ.get('ETL_LANE_FANOUT_WEIGHT', 1)),
+}
 LEVEL_LOG = 'INFO'
+# за один проход по фильмам собираются и документы персон и жанров
+SINGLE_PASS = os.environ.get('ETL_SINGLE_PASS', 'False') == 'True'
+BUILDER_MAX_DOCS = int(os.environ.get('ETL_BUILDER_MAX_DOCS', 1000))
+# full - документ персоны или жанра перестраивается целиком при каждом
+# изменении, incremental - обновляются частично (имя, добавленные связи).
+# В incremental не видна смена роли в существующей связи person_film_work:
+# у связей нет modified, поэтому по умолчанию full. Полное перестроение
+# всегда доступно через `main.py --rebuild`
+INDEX_UPDATE_MODE = os.environ.get('ETL_INDEX_UPDATE_MODE', 'full')
 
 LOG_CONFIG = {
     "version": 1,
@@ -173,6 +188,9 @@ index_movies_settings_elastic = {
             "imdb_rating": {
                 "type": "float"
             },
+            "modified": {
+                "type": "date"
+            },
             "title": {
                 "type": "text",
                 "fields": {
@@ -222,6 +240,9 @@ index_persons_settings_elastic = {
             "film_ids": {
                 "type": "keyword"
             },
+            "modified": {
+                "type": "date"
+            },
         }
     },
     "settings": index_settings
@@ -246,11 +267,20 @@ index_genres_settings_elastic = {
             "film_ids": {
                 "type": "keyword"
             },
+            "modified": {
+                "type": "date"
+            },
         }
     },
     "settings": index_settings
 }
 
+# количество символов id, по которым строятся корзины при сверке
+# postgres и elasticsearch, и максимальный размер корзины, которую
+# сверяют поштучно (иначе она делится дальше)
+VERIFY_PREFIX_LEN = 2
+VERIFY_BUCKET_LIMIT = 5000
+
 elastic_index = {
     'movies': index_movies_settings_elastic,
     'persons': index_persons_settings_elastic,
@@ -1,3 +1,4 @@
+import argparse
 import fcntl
 import json
 import logging
@@ -6,11 +7,19 @@ from datetime import datetime
 from logging import config
 from time import sleep
 
-from config import DEFAULT_DATE, CHUNK_SIZE
-from config import LOG_CONFIG, TUME_TO_RESTART
-from utils.elastic_db import ELFilm
+from config import DEFAULT_DATE, CHUNK_SIZE, CYCLE_TIME_BUDGET, LANE_WEIGHTS
+from config import LOG_CONFIG, TUME_TO_RESTART, SINGLE_PASS
+from config import INDEX_UPDATE_MODE
+from models import GenreElastic, PersonElastic
+from utils.doc_builder import DocumentBuilder
+from utils.elastic_db import ELFilm, REMOVE_NESTED_SCRIPT, REMOVE_SCRIPT
 from utils.postgres_db import (PGFilmWork, transform_film,
-                               transform_persons, transform_genres)
+                               transform_persons, transform_genres,
+                               collect_persons_genres,
+                               transform_person_names, transform_genre_names,
+                               transform_deleted)
+from utils.profiler import PROFILER
+from utils.scheduler import Lane, LaneScheduler
 from utils.state import State, RedisStorage
 
 config.dictConfig(LOG_CONFIG)
@@ -24,7 +33,8 @@ def run_once(fh):
         os._exit(0)
 
 
-def loader_es(state: State, pg: PGFilmWork, table: dict, es: ELFilm):
+def loader_es(state: State, pg: PGFilmWork, table: dict, es: ELFilm,
+              builders: dict = None):
     table_name = table['name']
     limit = CHUNK_SIZE
     state_table = {}
@@ -34,11 +44,16 @@ def loader_es(state: State, pg: PGFilmWork, table: dict, es: ELFilm):
         state_table = json.loads(state_table_raw)
     date_start = state_table.get('date', DEFAULT_DATE)
     offset_start = state_table.get('offset', 0)
+    film_offset = state_table.get('film_offset', 0)
     date_end = date_start
 
     for modified_ids in pg.chunk_read_table_id(table_name, date_start, limit,
                                                offset_start):
         date_end = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if PROFILER.enabled:
+            PROFILER.annotate(table=table_name,
+                              ids=[item['id'] for item in modified_ids])
+        chunk_offset = offset_start
         offset_start += limit
         if table.get('func_film_id', None):
             film_modified_ids = pg.get_film_id_in_table(table_name,
@@ -48,7 +63,7 @@ def loader_es(state: State, pg: PGFilmWork, table: dict, es: ELFilm):
             film_modified_ids = modified_ids
 
         transform_personal_index = table.get('transform_personal_index', None)
-        if transform_personal_index:
+        if transform_personal_index and not film_offset:
             get_data = transform_personal_index['get_data'](
                 [item['id'] for item in modified_ids]
             )
@@ -57,21 +72,165 @@ def loader_es(state: State, pg: PGFilmWork, table: dict, es: ELFilm):
             )
             es.set_bulk(
                 transform_personal_index['index_name'],
-                serialize_data_index.values()
+                serialize_data_index.values(),
+                transform_personal_index.get('action', 'index')
             )
 
+        # фильмы одной пачки персон может быть очень много, поэтому они
+        # загружаются частями с сохранением позиции внутри пачки
+        film_ids = [item['id'] for item in film_modified_ids]
+        for film_start in range(film_offset, len(film_ids), limit):
+            PROFILER.annotate(film_offset=film_start)
+            film_result = pg.get_film_data(
+                film_ids[film_start:film_start + limit])
+            if film_result:
+                film_serialize = transform_film(film_result)
+                es.set_bulk('movies', film_serialize.values())
+                if builders:
+                    collect_persons_genres(film_result, builders['persons'],
+                                           builders['genres'])
+            if film_start + limit < len(film_ids):
+                flush_builders(builders)
+                state.set_state(table['name'], json.dumps(
+                    {'offset': chunk_offset, 'date': date_start,
+                     'film_offset': film_start + limit}))
+                yield modified_ids[-1]['modified']
+        film_offset = 0
 
-        film_result = pg.get_film_data(
-            [item['id'] for item in film_modified_ids])
-        if film_result:
-            film_serialize = transform_film(film_result)
-            es.set_bulk('movies', film_serialize.values())
+        flush_builders(builders)
         state.set_state(table['name'], json.dumps(
             {'offset': offset_start, 'date': date_start}))
+        yield modified_ids[-1]['modified']
     state.set_state(table['name'], json.dumps({'offset': 0, 'date': date_end}))
 
 
-def process(state: State, pg: PGFilmWork, es: ELFilm) -> None:
+def loader_links(state: State, pg: PGFilmWork, link: dict, es: ELFilm):
+    """
+    Новые связи фильмов с персонами и жанрами. Документ персоны/жанра
+    дополняется одним фильмом и ролью, фильм переиндексируется. Стоимость
+    не зависит от размера фильмографии.
+    """
+    table_name = link['name']
+    state_table = json.loads(state.get_state(table_name) or '{}')
+    date_start = state_table.get('date', DEFAULT_DATE)
+    offset_start = state_table.get('offset', 0)
+    date_end = date_start
+
+    builder = DocumentBuilder(es, link['index_name'], link['model'])
+    for rows in pg.chunk_read_link(table_name, date_start, CHUNK_SIZE,
+                                   offset_start):
+        date_end = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        offset_start += CHUNK_SIZE
+        if PROFILER.enabled:
+            PROFILER.annotate(table=table_name,
+                              film_ids=[row['film_work_id'] for row in rows])
+        for row in rows:
+            fields = {'name': row['name'], 'modified': row['dim_modified']}
+            if row['description'] is not None:
+                fields['description'] = row['description']
+            builder.add(row['dim_id'], row['film_work_id'], role=row['role'],
+                        **fields)
+        builder.flush()
+
+        film_result = pg.get_film_data(
+            list({row['film_work_id'] for row in rows}))
+        if film_result:
+            es.set_bulk('movies', transform_film(film_result).values())
+        state.set_state(table_name, json.dumps(
+            {'offset': offset_start, 'date': date_start}))
+        yield rows[-1]['modified']
+    state.set_state(table_name, json.dumps({'offset': 0, 'date': date_end}))
+
+
+def loader_deleted(pg: PGFilmWork, es: ELFilm):
+    """
+    Перенос удалений из журнала content.deleted_object: документы удаляются
+    пачкой, удалённые связи убираются из фильмов, персон и жанров
+    частичным обновлением. Обработанные записи удаляются из журнала по id.
+    """
+    for rows in pg.chunk_read_deleted(CHUNK_SIZE):
+        if PROFILER.enabled:
+            PROFILER.annotate(table='deleted_object',
+                              ids=[row['id'] for row in rows])
+        actions = transform_deleted(rows)
+        for index, ids in actions['delete'].items():
+            es.delete_bulk(index, ids)
+        es.script_bulk('movies', {
+            film_id: {'remove': {field: list(ids)
+                                 for field, ids in fields.items()}}
+            for film_id, fields in actions['movies'].items()
+        }, REMOVE_NESTED_SCRIPT)
+
+        # роли персоны пересчитываются по оставшимся связям
+        roles = {}
+        if actions['persons']:
+            roles = pg.get_person_roles(list(actions['persons']))
+        es.script_bulk('persons', {
+            person_id: {'sets': {'film_ids': list(film_ids)},
+                        'doc': {'role': roles.get(person_id, [])}}
+            for person_id, film_ids in actions['persons'].items()
+        }, REMOVE_SCRIPT)
+        es.script_bulk('genres', {
+            genre_id: {'sets': {'film_ids': list(film_ids)}, 'doc': {}}
+            for genre_id, film_ids in actions['genres'].items()
+        }, REMOVE_SCRIPT)
+
+        pg.purge_deleted([row['id'] for row in rows])
+        yield rows[-1]['modified']
+
+
+def rebuild_index(pg: PGFilmWork, es: ELFilm, names: list) -> None:
+    """Полное перестроение документов персон и жанров по запросу"""
+    tables = {
+        'persons': ('person', pg.get_person_data, transform_persons),
+        'genres': ('genre', pg.get_genre_data, transform_genres),
+    }
+    for name in names:
+        table_name, get_data, func_transform = tables[name]
+        logging.info('rebuild index "{}" - start'.format(name))
+        for rows in pg.chunk_read_table_id(table_name, DEFAULT_DATE,
+                                           CHUNK_SIZE):
+            data = func_transform(get_data([item['id'] for item in rows]))
+            es.set_bulk(name, data.values())
+        logging.info('rebuild index "{}" - success'.format(name))
+
+
+def replay_chunks(pg: PGFilmWork, es: ELFilm, path: str) -> None:
+    """
+    Повторный прогон самых медленных пачек из отчёта профилировщика:
+    фильмы пачки заново читаются, преобразуются и загружаются в индекс
+    movies. Пачки журнала удалений не повторяются.
+    """
+    with open(path) as file:
+        chunks = json.load(file)['slowest']
+    for chunk in chunks:
+        table, ids = chunk.get('table'), chunk.get('ids', [])
+        if table in ('genre', 'person'):
+            film_ids = [item['id'] for item in
+                        pg.get_film_id_in_table(table, ids)]
+        elif table == 'film_work':
+            film_ids = ids
+        else:
+            film_ids = chunk.get('film_ids', [])
+        if not film_ids:
+            continue
+        PROFILER.start_chunk('replay')
+        PROFILER.annotate(table=table, ids=ids)
+        for start in range(0, len(film_ids), CHUNK_SIZE):
+            film_result = pg.get_film_data(film_ids[start:start + CHUNK_SIZE])
+            if film_result:
+                es.set_bulk('movies', transform_film(film_result).values())
+        PROFILER.end_chunk()
+
+
+def flush_builders(builders: dict = None) -> None:
+    # накопители сбрасываются до сохранения состояния, чтобы при падении
+    # документы персон и жанров не потерялись
+    for builder in (builders or {}).values():
+        builder.flush()
+
+
+def process(state: State, pg: PGFilmWork, es: ELFilm) -> bool:
     transform_index = {
         'persons': {
             'func_transform': transform_persons,
@@ -85,38 +244,129 @@ def process(state: State, pg: PGFilmWork, es: ELFilm) -> None:
         }
     }
 
-    tables_pg = [
-        {
+    links = []
+    if INDEX_UPDATE_MODE == 'incremental':
+        transform_index = {
+            'persons': {
+                'func_transform': transform_person_names,
+                'get_data': pg.get_person_names,
+                'index_name': 'persons',
+                'action': 'doc',
+            },
+            'genres': {
+                'func_transform': transform_genre_names,
+                'get_data': pg.get_genre_names,
+                'index_name': 'genres',
+                'action': 'doc',
+            }
+        }
+        links = [
+            {'name': 'genre_film_work', 'index_name': 'genres',
+             'model': GenreElastic},
+            {'name': 'person_film_work', 'index_name': 'persons',
+             'model': PersonElastic},
+        ]
+
+    builders = None
+    if SINGLE_PASS:
+        # документы персон и жанров собираются из тех же строк, что и
+        # фильмы, без отдельных запросов к таблицам связей
+        transform_index = {}
+        links = []
+        builders = {
+            'persons': DocumentBuilder(es, 'persons', PersonElastic),
+            'genres': DocumentBuilder(es, 'genres', GenreElastic),
+        }
+
+    tables_pg = {
+        'genre': {
             'name': 'genre',
             'func_film_id': True,
             'transform_personal_index': transform_index.get('genres', None)
         },
-        {
+        'person': {
             'name': 'person',
             'func_film_id': True,
             'transform_personal_index': transform_index.get('persons', None)
         },
-        {
+        'film_work': {
             'name': 'film_work'
         },
+    }
 
-    ]
+    def task(table):
+        def run():
+            logging.info('load table "{}" - start'.format(table['name']))
+            yield from loader_es(state, pg, table, es, builders)
+            logging.info('load table "{}" - success'.format(table['name']))
+        return run
+
+    def deleted_task():
+        logging.info('load deleted objects - start')
+        yield from loader_deleted(pg, es)
+        logging.info('load deleted objects - success')
 
-    for table in tables_pg:
-        # да, оно с одной стороны избыточно, но могут быть ситуации когда это
-        # поможет минимизировать пропуск изменяющихся данных
-        logging.info('load table "{}" - start'.format(table['name']))
-        loader_es(state, pg, table, es)
-        logging.info('load table "{}" - success'.format(table['name']))
+    def link_task(link):
+        def run():
+            logging.info('load links "{}" - start'.format(link['name']))
+            yield from loader_links(state, pg, link, es)
+            logging.info('load links "{}" - success'.format(link['name']))
+        return run
+
+    # правки фильмов идут отдельной очередью, чтобы не ждать, пока
+    # отработает перестроение фильмов по изменённым жанрам и персонам
+    lanes = [
+        Lane('films', LANE_WEIGHTS['films'],
+             [task(tables_pg['film_work']), deleted_task]),
+        Lane('fanout', LANE_WEIGHTS['fanout'],
+             [task(tables_pg['genre']), task(tables_pg['person'])]
+             + [link_task(link) for link in links]),
+    ]
+    return LaneScheduler(lanes, CYCLE_TIME_BUDGET).run()
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rebuild', nargs='+', choices=('persons', 'genres'),
+                        help='полностью перестроить индексы и выйти')
+    parser.add_argument('--profile', action='store_true',
+                        help='время этапов по пачкам и профили циклов')
+    parser.add_argument('--profile-dir', default='profiles')
+    parser.add_argument('--profile-sample', type=float, default=1.0,
+                        help='доля циклов с cProfile/tracemalloc')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='снимки tracemalloc')
+    parser.add_argument('--profile-keep', type=int, default=100,
+                        help='хранить файлы последних N выбранных циклов')
+    parser.add_argument('--replay', metavar='REPORT',
+                        help='повторить медленные пачки из отчёта профиля')
+    args = parser.parse_args()
+
     fh = open(os.path.realpath(__file__), 'r')
     run_once(fh)
     state = State(RedisStorage())
     pg = PGFilmWork()
     es = ELFilm()
 
+    if args.profile or args.replay:
+        PROFILER.configure(args.profile_dir, sample=args.profile_sample,
+                           memory=args.profile_memory,
+                           keep=args.profile_keep)
+        pg = PROFILER.instrument(pg, 'postgres')
+        es = PROFILER.instrument(es, 'elastic')
+
+    if args.replay:
+        with PROFILER.cycle(force=True):
+            replay_chunks(pg, es, args.replay)
+        os._exit(0)
+
+    if args.rebuild:
+        rebuild_index(pg, es, args.rebuild)
+        os._exit(0)
+
     while True:
-        process(state, pg, es)
-        sleep(TUME_TO_RESTART)
+        # если бюджет цикла исчерпан, не ждём и сразу продолжаем
+        with PROFILER.cycle():
+            drained = process(state, pg, es)
+        if drained:
+            sleep(TUME_TO_RESTART)
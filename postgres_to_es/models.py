@@ -14,12 +14,14 @@ class Person(BaseModel):
 class PersonRaw(Person):
     role_raw: Optional[str] = Field(alias='role')
     film_work_id: Optional[str]
+    modified: Optional[datetime.datetime]
 
 
 class PersonElastic(Person):
     name: str
     role: Set[str] = set()
     film_ids: Set[str] = set()
+    modified: Optional[datetime.datetime]
 
 
 class Genre(BaseModel):
@@ -29,12 +31,14 @@ class Genre(BaseModel):
 
 class GenreRaw(Genre):
     description: Optional[str]
-    film_work_id: str
+    film_work_id: Optional[str]
+    modified: Optional[datetime.datetime]
 
 
 class GenreElastic(Genre):
     description: Optional[str]
     film_ids: Set[str] = set()
+    modified: Optional[datetime.datetime]
 
 
 class FilmElastick(BaseModel):
@@ -50,6 +54,7 @@ class FilmElastick(BaseModel):
     directors_names: Set = set()
     genres: List[Genre] = []
     genres_names: List = []
+    modified: Optional[datetime.datetime]
 
 
 class RawMovies(BaseModel):
@@ -65,3 +70,6 @@ class RawMovies(BaseModel):
     person_name: Optional[str] = Field(alias='full_name')
     genre_id: Optional[str] = Field(alias='genre_id')
     genre_name: Optional[str] = Field(alias='name')
+    genre_description: Optional[str]
+    person_modified: Optional[datetime.datetime]
+    genre_modified: Optional[datetime.datetime]
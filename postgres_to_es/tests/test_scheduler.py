@@ -0,0 +1,68 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from utils.scheduler import Lane, LaneScheduler
+
+
+def task(log: list, name: str, chunks: int):
+    """Задача из chunks пачек, порядок обработки пишется в log"""
+    def run():
+        for number in range(chunks):
+            log.append(name)
+            yield datetime(2021, 1, 1) + timedelta(minutes=number)
+    return run
+
+
+class LaneTest(unittest.TestCase):
+
+    def test_step_runs_tasks_in_order(self):
+        log = []
+        lane = Lane('films', 1, [task(log, 'a', 2), task(log, 'b', 1)])
+        self.assertTrue(lane.step())
+        self.assertTrue(lane.step())
+        self.assertTrue(lane.step())
+        self.assertFalse(lane.step())
+        self.assertEqual(log, ['a', 'a', 'b'])
+        self.assertEqual(lane.chunks, 3)
+        self.assertTrue(lane.done)
+
+    def test_weight_at_least_one(self):
+        self.assertEqual(Lane('films', 0, []).weight, 1)
+
+    def test_lag(self):
+        lane = Lane('films', 1, [task([], 'a', 2)])
+        self.assertEqual(lane.lag(), 0.0)
+        lane.step()
+        expected = (datetime.now(timezone.utc) - datetime(
+            2021, 1, 1, tzinfo=timezone.utc)).total_seconds()
+        self.assertAlmostEqual(lane.lag(), expected, delta=5)
+
+    def test_close_stops_current_task(self):
+        lane = Lane('films', 1, [task([], 'a', 3)])
+        lane.step()
+        lane.close()
+        self.assertTrue(lane.done)
+
+
+class LaneSchedulerTest(unittest.TestCase):
+
+    def test_weighted_interleaving(self):
+        log = []
+        lanes = [Lane('films', 3, [task(log, 'films', 4)]),
+                 Lane('fanout', 1, [task(log, 'fanout', 3)])]
+        self.assertTrue(LaneScheduler(lanes, time_budget=60).run())
+        self.assertEqual(log, ['films', 'films', 'films', 'fanout',
+                               'films', 'fanout', 'fanout'])
+
+    def test_budget_exhausted(self):
+        log = []
+        lanes = [Lane('films', 1, [task(log, 'films', 2)])]
+        self.assertFalse(LaneScheduler(lanes, time_budget=0).run())
+        self.assertEqual(log, [])
+
+    def test_empty_lanes_are_drained(self):
+        self.assertTrue(LaneScheduler([Lane('films', 1, [])], 60).run())
+
+
+if __name__ == '__main__':
+    unittest.main()
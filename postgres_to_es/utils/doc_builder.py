@@ -0,0 +1,48 @@
+import logging
+from typing import Dict, Optional, Type
+
+from pydantic.main import BaseModel
+
+from config import BUILDER_MAX_DOCS
+from utils.elastic_db import ELFilm
+
+
+class DocumentBuilder:
+    """
+    Накопитель документов персон или жанров, собранных из строк фильмов.
+    Документы объединяются с уже проиндексированными (film_ids и role
+    дополняются), поэтому частичные данные не затирают фильмографию.
+    Объединение только добавляет: удалённые связи убираются из документов
+    по журналу удалений (main.loader_deleted), а прежняя роль персоны
+    после смены роли в связи остаётся до перестроения (main.py --rebuild).
+    Размер накопителя ограничен max_docs, при переполнении он сбрасывается
+    в elasticsearch.
+    """
+
+    def __init__(self, es: ELFilm, index: str, model: Type[BaseModel],
+                 max_docs: int = BUILDER_MAX_DOCS):
+        self.es = es
+        self.index = index
+        self.model = model
+        self.max_docs = max_docs
+        self._docs: Dict[str, BaseModel] = {}
+
+    def add(self, doc_id: str, film_id: str, role: Optional[str] = None,
+            **fields) -> None:
+        doc = self._docs.get(doc_id)
+        if doc is None:
+            if len(self._docs) >= self.max_docs:
+                self.flush()
+            doc = self.model(id=doc_id, **fields)
+            self._docs[doc_id] = doc
+        doc.film_ids.add(film_id)
+        if role:
+            doc.role.add(role)
+
+    def flush(self) -> None:
+        if not self._docs:
+            return
+        logging.debug('flush {} documents to "{}"'.format(
+            len(self._docs), self.index))
+        self.es.set_bulk(self.index, self._docs.values(), action='merge')
+        self._docs = {}
@@ -1,3 +1,4 @@
+import json
 import logging
 from logging import config
 
@@ -5,6 +6,7 @@ import elasticsearch
 from elasticsearch import Elasticsearch, helpers
 from pydantic.main import BaseModel
 from utils.backoff import backoff
+from utils.profiler import PROFILER
 
 from config import EL_DSL
 from config import LOG_CONFIG
@@ -12,6 +14,78 @@ from config import elastic_index
 
 config.dictConfig(LOG_CONFIG)
 
+# удаляет значения из множеств (film_ids) и перезаписывает поля документа
+REMOVE_SCRIPT = '''
+for (field in params.sets.keySet()) {
+    def current = ctx._source[field];
+    if (current == null) {
+        continue;
+    }
+    if (!(current instanceof List)) {
+        current = [current];
+    }
+    current.removeAll(params.sets[field]);
+    ctx._source[field] = current;
+}
+for (field in params.doc.keySet()) {
+    ctx._source[field] = params.doc[field];
+}
+'''
+
+# удаляет из фильма персон или жанры по id и пересобирает поле *_names
+REMOVE_NESTED_SCRIPT = '''
+for (field in params.remove.keySet()) {
+    def items = ctx._source[field];
+    if (items == null) {
+        continue;
+    }
+    def ids = params.remove[field];
+    def kept = new ArrayList();
+    def names = new ArrayList();
+    for (item in items) {
+        if (!ids.contains(item.id)) {
+            kept.add(item);
+            if (!names.contains(item.name)) {
+                names.add(item.name);
+            }
+        }
+    }
+    ctx._source[field] = kept;
+    ctx._source[field + '_names'] = names;
+}
+'''
+
+# скрипты агрегаций для сверки с postgres, должны давать те же значения,
+# что и PGFilmWork.bucket_checksums
+BUCKET_KEY_SCRIPT = "doc['id'].value.substring(0, params.len)"
+BUCKET_ID_SCRIPT = "Long.parseLong(doc['id'].value.substring(0, 8), 16)"
+BUCKET_MODIFIED_SCRIPT = (
+    "doc['modified'].size() == 0 ? 0 : "
+    "doc['modified'].value.toEpochSecond()"
+)
+
+# объединяет множества (film_ids, role) с уже сохранёнными в документе,
+# остальные поля перезаписывает
+MERGE_SCRIPT = '''
+for (field in params.sets.keySet()) {
+    def current = ctx._source[field];
+    if (current == null) {
+        current = new ArrayList();
+    } else if (!(current instanceof List)) {
+        current = [current];
+    }
+    for (value in params.sets[field]) {
+        if (!current.contains(value)) {
+            current.add(value);
+        }
+    }
+    ctx._source[field] = current;
+}
+for (field in params.doc.keySet()) {
+    ctx._source[field] = params.doc[field];
+}
+'''
+
 
 class ELConnectorBase:
     def __init__(self):
@@ -31,6 +105,12 @@ class ELConnectorBase:
                     **index_setting,
                     ignore=400
                 )
+            else:
+                # добавляет в существующий индекс новые поля схемы
+                self.client.indices.put_mapping(
+                    index=name,
+                    **index_setting['mappings']
+                )
 
     def __del__(self):
         if self.client:
@@ -40,18 +120,151 @@ class ELConnectorBase:
 class ELFilm(ELConnectorBase):
 
     @backoff(logging=logging)
-    def set_bulk(self, index, data):
+    def set_bulk(self, index, data, action='index'):
         try:
-            helpers.bulk(self.client, self.generate_elastic_data(index, data))
+            helpers.bulk(self.client,
+                         self.generate_elastic_data(index, data, action))
         except elasticsearch.exceptions.ConnectionError:
             logging.error('Ошибка подключения к базе elasticsearch')
             self.connect()
-            helpers.bulk(self.client, self.generate_elastic_data(index, data))
+            helpers.bulk(self.client,
+                         self.generate_elastic_data(index, data, action))
 
-    def generate_elastic_data(self, index, data: list[BaseModel]):
+    def generate_elastic_data(self, index, data: list[BaseModel],
+                              action='index'):
         for item in data:
+            if action == 'merge':
+                yield self.merge_action(index, item)
+                continue
+            if action == 'doc':
+                yield self.doc_action(index, item)
+                continue
+            with PROFILER.stage('encode'):
+                source = item.json()
             yield {
                 '_index': index,
                 '_id': item.id,
-                '_source': item.json()
+                '_source': source
             }
+
+    @staticmethod
+    @PROFILER.timed('encode')
+    def doc_action(index, item: BaseModel) -> dict:
+        # частичное обновление без полей-множеств: film_ids и role
+        # документа остаются как есть
+        source = json.loads(item.json())
+        return {
+            '_op_type': 'update',
+            '_index': index,
+            '_id': item.id,
+            'doc': {name: source[name] for name, value in item
+                    if not isinstance(value, set)},
+            'upsert': source,
+        }
+
+    @staticmethod
+    @PROFILER.timed('encode')
+    def merge_action(index, item: BaseModel) -> dict:
+        source = json.loads(item.json())
+        sets = {name: source[name] for name, value in item
+                if isinstance(value, set)}
+        doc = {name: value for name, value in source.items()
+               if name not in sets}
+        return {
+            '_op_type': 'update',
+            '_index': index,
+            '_id': item.id,
+            'script': {
+                'source': MERGE_SCRIPT,
+                'lang': 'painless',
+                'params': {'sets': sets, 'doc': doc},
+            },
+            'upsert': source,
+        }
+
+    @backoff(logging=logging)
+    def delete_bulk(self, index, ids):
+        actions = ({'_op_type': 'delete', '_index': index, '_id': id}
+                   for id in ids)
+        _, errors = helpers.bulk(self.client, actions, raise_on_error=False)
+        self.log_bulk_errors(errors)
+
+    @backoff(logging=logging)
+    def script_bulk(self, index, scripts: dict, source: str):
+        """Частичное обновление документов скриптом, scripts: id -> params"""
+        actions = ({
+            '_op_type': 'update',
+            '_index': index,
+            '_id': id,
+            'script': {'source': source, 'lang': 'painless',
+                       'params': params},
+        } for id, params in scripts.items())
+        _, errors = helpers.bulk(self.client, actions, raise_on_error=False)
+        self.log_bulk_errors(errors)
+
+    @staticmethod
+    def log_bulk_errors(errors):
+        # отсутствующие документы (404) не считаются ошибкой: документ
+        # мог быть удалён в той же пачке или ещё не проиндексирован
+        for error in errors:
+            status = next(iter(error.values()), {}).get('status')
+            if status != 404:
+                logging.error('Ошибка записи в elasticsearch {}'.format(error))
+
+    @backoff(logging=logging)
+    def bucket_checksums(self, index: str, prefix_len: int,
+                         prefix: str = '') -> dict:
+        """
+        Контрольные суммы корзин документов, сгруппированных по первым
+        prefix_len символам id: количество, сумма modified (в секундах) и
+        сумма первых 8 символов id как числа.
+        """
+        query = {'prefix': {'id': prefix}} if prefix else {'match_all': {}}
+        aggs = {
+            'buckets': {
+                'composite': {
+                    'size': 1000,
+                    'sources': [{'key': {'terms': {'script': {
+                        'source': BUCKET_KEY_SCRIPT,
+                        'params': {'len': prefix_len},
+                    }}}}],
+                },
+                'aggs': {
+                    'modified': {'sum': {'script': BUCKET_MODIFIED_SCRIPT}},
+                    'id': {'sum': {'script': BUCKET_ID_SCRIPT}},
+                },
+            }
+        }
+        result = {}
+        while True:
+            response = self.client.search(index=index, size=0, query=query,
+                                          aggs=aggs)
+            agg = response['aggregations']['buckets']
+            for bucket in agg['buckets']:
+                result[bucket['key']['key']] = (
+                    bucket['doc_count'],
+                    int(bucket['modified']['value']),
+                    int(bucket['id']['value']),
+                )
+            if 'after_key' not in agg or not agg['buckets']:
+                return result
+            aggs['buckets']['composite']['after'] = agg['after_key']
+
+    @backoff(logging=logging)
+    def bucket_ids(self, index: str, prefix: str) -> dict:
+        """id и modified (в секундах) документов корзины"""
+        result = {}
+        for hit in helpers.scan(
+                self.client,
+                index=index,
+                query={
+                    'query': {'prefix': {'id': prefix}},
+                    '_source': False,
+                    'docvalue_fields': [
+                        {'field': 'modified', 'format': 'epoch_second'}
+                    ],
+                },
+        ):
+            modified = hit.get('fields', {}).get('modified', [0])[0]
+            result[hit['_id']] = int(float(modified))
+        return result
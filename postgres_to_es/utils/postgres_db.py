@@ -12,9 +12,29 @@ from config import PersonRole
 from models import (RawMovies, FilmElastick, Person, PersonElastic,
                     PersonRaw, Genre, GenreRaw, GenreElastic)
 from utils.backoff import backoff
+from utils.profiler import PROFILER
 
 config.dictConfig(LOG_CONFIG)
 
+# строки таблиц связей приводятся к общему виду: фильм, персона или жанр
+# (dim_id), роль и данные для создания документа, если его ещё нет
+LINK_TABLES_SQL = {
+    'person_film_work': (
+        "SELECT l.id, l.created AS modified, l.film_work_id, "
+        "l.person_id AS dim_id, l.role, d.full_name AS name, "
+        "NULL AS description, d.modified AS dim_modified "
+        "FROM content.person_film_work l "
+        "JOIN content.person d ON d.id = l.person_id"
+    ),
+    'genre_film_work': (
+        "SELECT l.id, l.created AS modified, l.film_work_id, "
+        "l.genre_id AS dim_id, NULL AS role, d.name, d.description, "
+        "d.modified AS dim_modified "
+        "FROM content.genre_film_work l "
+        "JOIN content.genre d ON d.id = l.genre_id"
+    ),
+}
+
 
 def add_role_person(role, data, film):
     mapping_person = {
@@ -42,6 +62,22 @@ def add_role_person(role, data, film):
             data_mapping['obj'].append(person)
 
 
+def uuid_prefix_range(prefix: str) -> dict:
+    """Границы диапазона uuid, текстовое представление которых
+    начинается с prefix. Позволяет использовать индекс по id"""
+    digits = prefix.replace('-', '')
+
+    def to_uuid(hex_str):
+        return '{}-{}-{}-{}-{}'.format(hex_str[:8], hex_str[8:12],
+                                       hex_str[12:16], hex_str[16:20],
+                                       hex_str[20:])
+
+    return {
+        'low': to_uuid(digits.ljust(32, '0')),
+        'high': to_uuid(digits.ljust(32, 'f')),
+    }
+
+
 class PGConnectorBase:
     def __init__(self, logging=logging):
         self.db = None
@@ -65,6 +101,16 @@ class PGConnectorBase:
         result = self.cursor.fetchall()
         return result
 
+    @backoff(logging=logging)
+    def execute(self, sql: str) -> None:
+        try:
+            self.cursor.execute(sql)
+        except psycopg2.OperationalError:
+            self._logging.error('Ошибка подключения к базе postgres')
+            self.connect()
+            self.cursor.execute(sql)
+        self.db.commit()
+
     def __del__(self) -> None:
         if self.db:
             self.db.close()
@@ -74,13 +120,24 @@ class PGFilmWork(PGConnectorBase):
 
     def chunk_read_table_id(self, table: str, date_start: str, limit: int,
                             offset: int = 0) -> List[RealDictRow]:
-        while True:
-            sql_tmp = ("select id, modified "
-                       "from content.{} "
-                       "where modified >= %(date)s  "
-                       "ORDER BY modified limit %(limit)s "
-                       "offset %(offset)s").format(table)
+        sql_tmp = ("select id, modified "
+                   "from content.{} "
+                   "where modified >= %(date)s  "
+                   "ORDER BY modified limit %(limit)s "
+                   "offset %(offset)s").format(table)
+        yield from self._chunk_read(sql_tmp, date_start, limit, offset)
 
+    def chunk_read_link(self, table: str, date_start: str, limit: int,
+                        offset: int = 0) -> List[RealDictRow]:
+        """Новые строки таблицы связей вместе с данными персоны/жанра"""
+        sql_tmp = ("{} WHERE l.created >= %(date)s "
+                   "ORDER BY l.created limit %(limit)s "
+                   "offset %(offset)s").format(LINK_TABLES_SQL[table])
+        yield from self._chunk_read(sql_tmp, date_start, limit, offset)
+
+    def _chunk_read(self, sql_tmp: str, date_start: str, limit: int,
+                    offset: int = 0) -> List[RealDictRow]:
+        while True:
             sql = self.cursor.mogrify(sql_tmp, {
                 'date': date_start,
                 'limit': limit,
@@ -95,9 +152,87 @@ class PGFilmWork(PGConnectorBase):
             if len(table_id) != limit:
                 break
 
+    def chunk_read_deleted(self, limit: int) -> List[RealDictRow]:
+        """
+        Журнал удалений, заполняемый триггерами на таблицах content.
+        Читается с начала: id выдаётся при вставке, а не при фиксации,
+        поэтому отметка "последний id" пропустила бы долгие транзакции.
+        Перед следующей пачкой прочитанные записи удаляет purge_deleted.
+        """
+        while True:
+            sql = self.cursor.mogrify(
+                "SELECT id, table_name, object_id, film_work_id, related_id, "
+                "role, deleted AS modified "
+                "FROM content.deleted_object ORDER BY id LIMIT %(limit)s",
+                {'limit': limit}
+            )
+            rows = self.query(sql)
+            if not rows:
+                break
+            yield rows
+            if len(rows) != limit:
+                break
+
+    def purge_deleted(self, ids: List[int]) -> None:
+        sql = self.cursor.mogrify(
+            "DELETE FROM content.deleted_object WHERE id = ANY(%(ids)s)",
+            {'ids': ids}
+        )
+        self.execute(sql)
+
+    def get_person_roles(self, ids: List) -> Dict:
+        sql = self.cursor.mogrify(
+            "SELECT person_id, array_agg(DISTINCT role::text) AS roles "
+            "FROM content.person_film_work "
+            "WHERE person_id IN %(persons_ids)s GROUP BY person_id",
+            {'persons_ids': tuple(ids)}
+        )
+        return {row['person_id']: [role for role in row['roles'] if role]
+                for row in self.query(sql)}
+
+    def get_person_names(self, ids: List) -> List[RealDictRow]:
+        sql_tmp = ("select id, full_name, modified from content.person "
+                   "WHERE id IN %(persons_ids)s")
+        sql = self.cursor.mogrify(sql_tmp, {'persons_ids': tuple(ids)})
+        return self.query(sql)
+
+    def get_genre_names(self, ids: List) -> List[RealDictRow]:
+        sql_tmp = ("select id, name, description, modified "
+                   "from content.genre "
+                   "WHERE id IN %(genres_ids)s")
+        sql = self.cursor.mogrify(sql_tmp, {'genres_ids': tuple(ids)})
+        return self.query(sql)
+
+    def bucket_checksums(self, table: str, prefix_len: int,
+                         prefix: str = '') -> dict:
+        """Контрольные суммы корзин, см. ELFilm.bucket_checksums"""
+        sql_tmp = ("SELECT left(id::text, %(len)s) AS key, count(*) AS cnt, "
+                   "coalesce(sum(floor(extract(epoch FROM modified))), 0)"
+                   "::bigint AS modified, "
+                   "sum(('x' || left(id::text, 8))::bit(32)::bigint) "
+                   "AS sum_id "
+                   "FROM content.{} "
+                   "WHERE id BETWEEN %(low)s AND %(high)s "
+                   "GROUP BY 1").format(table)
+        sql = self.cursor.mogrify(sql_tmp, {'len': prefix_len,
+                                            **uuid_prefix_range(prefix)})
+        return {row['key']: (row['cnt'], int(row['modified']),
+                             int(row['sum_id']))
+                for row in self.query(sql)}
+
+    def bucket_ids(self, table: str, prefix: str) -> dict:
+        """id и modified (в секундах) строк корзины"""
+        sql_tmp = ("SELECT id, "
+                   "coalesce(floor(extract(epoch FROM modified)), 0)"
+                   "::bigint AS modified "
+                   "FROM content.{} "
+                   "WHERE id BETWEEN %(low)s AND %(high)s").format(table)
+        sql = self.cursor.mogrify(sql_tmp, uuid_prefix_range(prefix))
+        return {row['id']: int(row['modified']) for row in self.query(sql)}
+
     def get_person_data(self, ids: List) -> List[RealDictRow]:
         sql_tmp = (
-            "select p.id, full_name, pfw.role, pfw.film_work_id "
+            "select p.id, full_name, p.modified, pfw.role, pfw.film_work_id "
             "from content.person p "
             "left join content.person_film_work pfw on p.id = pfw.person_id "
             "WHERE p.id IN %(persons_ids)s"
@@ -111,9 +246,10 @@ class PGFilmWork(PGConnectorBase):
 
     def get_genre_data(self, ids: List) -> List[RealDictRow]:
         sql_tmp = (
-            "select g.id, g.name, g.description, gfw.film_work_id "
+            "select g.id, g.name, g.description, g.modified, "
+            "gfw.film_work_id "
             "from content.genre g "
-            "join content.genre_film_work gfw on g.id = gfw.genre_id "
+            "left join content.genre_film_work gfw on g.id = gfw.genre_id "
             "WHERE g.id IN %(genres_ids)s"
         )
 
@@ -128,7 +264,10 @@ class PGFilmWork(PGConnectorBase):
             return None
         sql_tmp = ("SELECT fw.id as fw_id, fw.title, fw.description, "
                    "fw.rating, fw.type, fw.created, fw.modified, "
-                   "pfw.role, p.id, p.full_name, g.name , g.id as genre_id "
+                   "pfw.role, p.id, p.full_name, g.name , g.id as genre_id, "
+                   "g.description as genre_description, "
+                   "p.modified as person_modified, "
+                   "g.modified as genre_modified "
                    "FROM content.film_work fw "
                    "LEFT JOIN content.person_film_work pfw "
                    "ON pfw.film_work_id = fw.id "
@@ -147,16 +286,19 @@ class PGFilmWork(PGConnectorBase):
             table: str,
             table_ids: List
     ) -> List[RealDictRow]:
-        sql_tmp = ("SELECT fw.id FROM content.film_work fw "
+        # порядок по id стабилен между циклами, это позволяет продолжить
+        # загрузку фильмов пачки с сохранённой позиции
+        sql_tmp = ("SELECT DISTINCT fw.id FROM content.film_work fw "
                    "LEFT JOIN content.{table}_film_work pfw "
                    "ON pfw.film_work_id = fw.id "
                    "WHERE pfw.{table}_id IN %(ids)s "
-                   "ORDER BY fw.modified").format(table=table)
+                   "ORDER BY fw.id").format(table=table)
         sql = self.cursor.mogrify(sql_tmp, {'ids': tuple(table_ids)})
         result = self.query(sql)
         return result
 
 
+@PROFILER.timed('transform')
 def transform_film(films_raw: List[RealDictRow]) -> Dict:
     result = defaultdict(dict)
     for film in films_raw:
@@ -183,6 +325,53 @@ def transform_film(films_raw: List[RealDictRow]) -> Dict:
     return result
 
 
+@PROFILER.timed('transform')
+def collect_persons_genres(films_raw: List[RealDictRow], persons,
+                           genres) -> None:
+    """Передать персон и жанры из строк фильмов в накопители документов"""
+    for film in films_raw:
+        try:
+            mv = RawMovies(**film)
+        except Exception as e:
+            logging.error(e)
+            continue
+        if mv.person_id:
+            persons.add(mv.person_id, mv.fw_id, role=mv.role,
+                        name=mv.person_name, modified=mv.person_modified)
+        if mv.genre_id:
+            genres.add(mv.genre_id, mv.fw_id, name=mv.genre_name,
+                       description=mv.genre_description,
+                       modified=mv.genre_modified)
+
+
+@PROFILER.timed('transform')
+def transform_person_names(get_data: List[RealDictRow]) -> Dict:
+    result = {}
+    for person in get_data:
+        try:
+            p = Person(**person)
+        except Exception as e:
+            logging.error(e)
+            continue
+        result[p.id] = PersonElastic(id=p.id, name=p.name,
+                                     modified=person.get('modified'))
+    return result
+
+
+@PROFILER.timed('transform')
+def transform_genre_names(get_data: List[RealDictRow]) -> Dict:
+    result = {}
+    for genre in get_data:
+        try:
+            g = GenreElastic(**genre)
+        except Exception as e:
+            logging.error(e)
+            continue
+        result[g.id] = g
+    return result
+
+
+@PROFILER.timed('transform')
 def transform_persons(
         get_data: List[RealDictRow],
 ) -> List:
@@ -197,12 +386,16 @@ def transform_persons(
         data = result[id]
         if not data:
             data = PersonElastic(**p_raw.dict())
-        data.role.add(p_raw.role_raw)
-        data.film_ids.add(p_raw.film_work_id)
+        # персона или жанр без фильмов тоже индексируются, чтобы сверка
+        # с postgres не находила их отсутствующими
+        if p_raw.film_work_id:
+            data.role.add(p_raw.role_raw)
+            data.film_ids.add(p_raw.film_work_id)
         result[id] = data
     return result
 
 
+@PROFILER.timed('transform')
 def transform_genres(
         get_data: List[RealDictRow],
 ) -> List:
@@ -218,6 +411,44 @@ def transform_genres(
         if not data:
             data = GenreElastic(**genre_raw.dict())
         data.description = genre_raw.description
-        data.film_ids.add(genre_raw.film_work_id)
+        if genre_raw.film_work_id:
+            data.film_ids.add(genre_raw.film_work_id)
         result[id] = data
     return result
+
+
+@PROFILER.timed('transform')
+def transform_deleted(deleted: List[RealDictRow]) -> Dict:
+    """
+    Разбор пачки журнала удалений на действия для elasticsearch: удаляемые
+    документы, удаляемые из фильмов персоны и жанры и фильмы, которые
+    нужно убрать из документов персон и жанров.
+    """
+    role_field = {
+        PersonRole.ACTOR.value: 'actors',
+        PersonRole.WRITER.value: 'writers',
+        PersonRole.DIRECTOR.value: 'directors',
+    }
+    index_name = {'film_work': 'movies', 'person': 'persons',
+                  'genre': 'genres'}
+    result = {
+        'delete': defaultdict(set),
+        'movies': defaultdict(lambda: defaultdict(set)),
+        'persons': defaultdict(set),
+        'genres': defaultdict(set),
+    }
+    for row in deleted:
+        table = row['table_name']
+        if table in index_name:
+            result['delete'][index_name[table]].add(row['object_id'])
+        elif table == 'person_film_work':
+            field = role_field.get(row['role'])
+            if field:
+                result['movies'][row['film_work_id']][field].add(
+                    row['related_id'])
+            result['persons'][row['related_id']].add(row['film_work_id'])
+        elif table == 'genre_film_work':
+            result['movies'][row['film_work_id']]['genres'].add(
+                row['related_id'])
+            result['genres'][row['related_id']].add(row['film_work_id'])
+    return result
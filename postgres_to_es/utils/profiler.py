@@ -0,0 +1,216 @@
+import cProfile
+import glob
+import json
+import logging
+import os
+import random
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from time import perf_counter
+from typing import Optional
+
+
+class CycleProfiler:
+    """
+    Профилирование циклов ETL (main.py --profile). Время каждой пачки
+    раскладывается по этапам: postgres, transform, encode, elastic - время
+    вложенного этапа не входит во время внешнего. Для выбранных с
+    вероятностью sample циклов дополнительно пишется профиль cProfile
+    (формат pstats), при memory - снимок tracemalloc, и отчёт JSON с
+    самыми медленными пачками и id их записей для повторного прогона
+    (main.py --replay). В каталоге хранятся файлы последних keep
+    выбранных циклов, для остальных циклов в лог пишется только сводка.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = 'profiles'
+        self.sample = 1.0
+        self.memory = False
+        self.top = 10
+        self.keep = 100
+        self.cycle_number = 0
+        self._prefix = ''
+        self._stack = []
+        self._chunk = None
+        self._chunks = []
+        self._stages = defaultdict(float)
+
+    def configure(self, output_dir: str, sample: float = 1.0,
+                  memory: bool = False, top: int = 10,
+                  keep: int = 100) -> None:
+        self.enabled = True
+        self.output_dir = output_dir
+        self.sample = sample
+        self.memory = memory
+        self.top = top
+        self.keep = keep
+        # файлы разных запусков не перезаписывают друг друга
+        self._prefix = 'cycle-{}-{}'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S'), os.getpid())
+        os.makedirs(output_dir, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        now = perf_counter()
+        if self._stack:
+            parent, started = self._stack[-1]
+            self._add(parent, now - started)
+        self._stack.append((name, now))
+        try:
+            yield
+        finally:
+            name, started = self._stack.pop()
+            now = perf_counter()
+            self._add(name, now - started)
+            if self._stack:
+                self._stack[-1] = (self._stack[-1][0], now)
+
+    def timed(self, name: str):
+        """Декоратор: вызовы функции считаются этапом name"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def instrument(self, obj, name: str):
+        """Обёртка, в которой все методы объекта считаются этапом name"""
+        return _StageProxy(self, obj, name)
+
+    def _add(self, name: str, duration: float) -> None:
+        self._stages[name] += duration
+        if self._chunk is not None:
+            self._chunk['stages'][name] += duration
+
+    def start_chunk(self, lane: str) -> None:
+        if not self.enabled:
+            return
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._chunk = {'lane': lane, 'stages': defaultdict(float),
+                       'started': perf_counter()}
+
+    def annotate(self, **fields) -> None:
+        """Сведения о текущей пачке: таблица, id записей, даты"""
+        if self._chunk is not None:
+            self._chunk.update(fields)
+
+    def end_chunk(self, keep: bool = True) -> None:
+        chunk, self._chunk = self._chunk, None
+        if chunk is None or not keep:
+            return
+        chunk['seconds'] = perf_counter() - chunk.pop('started')
+        if self.memory and tracemalloc.is_tracing():
+            chunk['peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+        self._chunks.append(chunk)
+
+    @contextmanager
+    def cycle(self, force: bool = False):
+        """Цикл ETL; force - профилировать независимо от sample"""
+        if not self.enabled:
+            yield
+            return
+        self.cycle_number += 1
+        self._chunks = []
+        self._stages = defaultdict(float)
+        sampled = force or random.random() < self.sample
+        profile: Optional[cProfile.Profile] = None
+        if sampled:
+            profile = cProfile.Profile()
+            if self.memory:
+                tracemalloc.start()
+            profile.enable()
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - started
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self._path('prof'))
+                if self.memory:
+                    tracemalloc.take_snapshot().dump(
+                        self._path('tracemalloc'))
+                    tracemalloc.stop()
+                self._write_report(seconds)
+                self._remove_old()
+            self._log_summary(seconds)
+
+    def _path(self, extension: str) -> str:
+        return os.path.join(self.output_dir, '{}-{:06d}.{}'.format(
+            self._prefix, self.cycle_number, extension))
+
+    def _write_report(self, seconds: float) -> None:
+        slowest = sorted(self._chunks, key=lambda chunk: chunk['seconds'],
+                         reverse=True)[:self.top]
+        report = {
+            'cycle': self.cycle_number,
+            'pid': os.getpid(),
+            'seconds': round(seconds, 3),
+            'chunks': len(self._chunks),
+            'stages': {name: round(value, 3)
+                       for name, value in self._stages.items()},
+            'slowest': slowest,
+        }
+        with open(self._path('json'), 'w') as file:
+            json.dump(report, file, indent=2, default=str)
+
+    def _remove_old(self) -> None:
+        """Удалить файлы циклов сверх последних keep"""
+        # имена начинаются с времени запуска, порядок имён - порядок циклов
+        reports = sorted(glob.glob(os.path.join(self.output_dir,
+                                                'cycle-*.json')))
+        for report in reports[:max(len(reports) - self.keep, 0)]:
+            for path in glob.glob(report[:-len('json')] + '*'):
+                os.remove(path)
+
+    def _log_summary(self, seconds: float) -> None:
+        logging.info('profile cycle {}: {:.1f}s, chunks {}, {}'.format(
+            self.cycle_number, seconds, len(self._chunks),
+            ', '.join('{} {:.1f}s'.format(name, value)
+                      for name, value in sorted(self._stages.items()))))
+
+
+class _StageProxy:
+    def __init__(self, profiler: CycleProfiler, obj, name: str):
+        self._profiler = profiler
+        self._obj = obj
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._obj, attr)
+        if attr.startswith('_') or not callable(value):
+            return value
+
+        @wraps(value)
+        def method(*args, **kwargs):
+            with self._profiler.stage(self._name):
+                result = value(*args, **kwargs)
+            if hasattr(result, '__next__'):
+                # чтение пачками: время каждой пачки тоже этап name
+                return self._iterate(result)
+            return result
+        return method
+
+    def _iterate(self, iterator):
+        while True:
+            with self._profiler.stage(self._name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+PROFILER = CycleProfiler()
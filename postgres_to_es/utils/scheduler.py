@@ -0,0 +1,95 @@
+import logging
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Callable, Iterator, List, Optional
+
+from utils.profiler import PROFILER
+
+
+class Lane:
+    """
+    Очередь задач одного приоритета. Задачи выполняются последовательно,
+    каждая задача - генератор, который отдаёт управление после обработки
+    очередной пачки и возвращает дату изменения последней записи пачки.
+    """
+
+    def __init__(self, name: str, weight: int,
+                 tasks: List[Callable[[], Iterator[datetime]]]):
+        self.name = name
+        self.weight = max(int(weight), 1)
+        self._tasks = list(tasks)
+        self._current: Optional[Iterator[datetime]] = None
+        self.last_modified: Optional[datetime] = None
+        self.chunks = 0
+
+    @property
+    def done(self) -> bool:
+        return self._current is None and not self._tasks
+
+    def step(self) -> bool:
+        """Обработать одну пачку. Возвращает False, если задачи кончились"""
+        PROFILER.start_chunk(self.name)
+        while True:
+            if self._current is None:
+                if not self._tasks:
+                    PROFILER.end_chunk(keep=False)
+                    return False
+                self._current = self._tasks.pop(0)()
+            try:
+                self.last_modified = next(self._current)
+            except StopIteration:
+                self._current = None
+                self.last_modified = None
+                continue
+            self.chunks += 1
+            PROFILER.end_chunk()
+            return True
+
+    def lag(self) -> float:
+        """Отставание очереди в секундах от текущего момента"""
+        if self.done or self.last_modified is None:
+            return 0.0
+        last_modified = self.last_modified
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - last_modified).total_seconds()
+
+    def close(self) -> None:
+        # состояние сохраняется после каждой пачки, поэтому незавершённую
+        # задачу можно просто закрыть и продолжить в следующем цикле
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+
+
+class LaneScheduler:
+    """
+    Взвешенное чередование очередей: за один проход каждая очередь
+    обрабатывает weight пачек. Цикл ограничен бюджетом времени, чтобы
+    массовая переиндексация не задерживала правки фильмов.
+    """
+
+    def __init__(self, lanes: List[Lane], time_budget: float):
+        self.lanes = lanes
+        self.time_budget = time_budget
+
+    def run(self) -> bool:
+        """Возвращает True, если все очереди обработаны полностью"""
+        deadline = monotonic() + self.time_budget
+        active = list(self.lanes)
+        while active and monotonic() < deadline:
+            for lane in list(active):
+                for _ in range(lane.weight):
+                    if monotonic() >= deadline:
+                        break
+                    if not lane.step():
+                        active.remove(lane)
+                        break
+
+        drained = all(lane.done for lane in self.lanes)
+        for lane in self.lanes:
+            logging.info('lane "{}": chunks {}, lag {:.1f}s{}'.format(
+                lane.name, lane.chunks, lane.lag(),
+                '' if lane.done else ' (budget exhausted)'))
+            lane.close()
+        return drained
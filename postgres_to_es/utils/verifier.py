@@ -0,0 +1,88 @@
+import logging
+from typing import Callable, Dict, List, Set
+
+from config import CHUNK_SIZE, VERIFY_BUCKET_LIMIT, VERIFY_PREFIX_LEN
+from utils.elastic_db import ELFilm
+from utils.postgres_db import (PGFilmWork, transform_film, transform_genres,
+                               transform_persons)
+
+
+class ConsistencyVerifier:
+    """
+    Сверка postgres и индекса elasticsearch по контрольным суммам корзин
+    id. Поштучно сравниваются только корзины с расхождениями, найденные
+    документы переиндексируются или удаляются.
+    """
+
+    def __init__(self, pg: PGFilmWork, es: ELFilm):
+        self.pg = pg
+        self.es = es
+        self.indexes: Dict[str, dict] = {
+            'movies': {
+                'table': 'film_work',
+                'get_data': pg.get_film_data,
+                'func_transform': transform_film,
+            },
+            'persons': {
+                'table': 'person',
+                'get_data': pg.get_person_data,
+                'func_transform': transform_persons,
+            },
+            'genres': {
+                'table': 'genre',
+                'get_data': pg.get_genre_data,
+                'func_transform': transform_genres,
+            },
+        }
+
+    def verify(self, index: str, repair: bool = False) -> dict:
+        table = self.indexes[index]['table']
+        stale: Set[str] = set()
+        extra: Set[str] = set()
+        self._compare(index, table, '', VERIFY_PREFIX_LEN, stale, extra)
+        logging.info('verify "{}": stale or missing {}, extra {}'.format(
+            index, len(stale), len(extra)))
+        if repair:
+            self.repair(index, stale, extra)
+        return {'stale': stale, 'extra': extra}
+
+    def _compare(self, index: str, table: str, prefix: str, prefix_len: int,
+                 stale: Set[str], extra: Set[str]) -> None:
+        pg_buckets = self.pg.bucket_checksums(table, prefix_len, prefix)
+        es_buckets = self.es.bucket_checksums(index, prefix_len, prefix)
+        for key in sorted(set(pg_buckets) | set(es_buckets)):
+            pg_sum = pg_buckets.get(key)
+            es_sum = es_buckets.get(key)
+            if pg_sum == es_sum:
+                continue
+            size = max(pg_sum[0] if pg_sum else 0, es_sum[0] if es_sum else 0)
+            if size > VERIFY_BUCKET_LIMIT and len(key) < 32:
+                self._compare(index, table, key, len(key) + 1, stale, extra)
+                continue
+            self._compare_ids(index, table, key, stale, extra)
+
+    def _compare_ids(self, index: str, table: str, prefix: str,
+                     stale: Set[str], extra: Set[str]) -> None:
+        pg_ids = self.pg.bucket_ids(table, prefix)
+        es_ids = self.es.bucket_ids(index, prefix)
+        for id, modified in pg_ids.items():
+            if es_ids.get(id) != modified:
+                stale.add(id)
+        extra.update(set(es_ids) - set(pg_ids))
+
+    def repair(self, index: str, stale: Set[str], extra: Set[str]) -> None:
+        if extra:
+            self.es.delete_bulk(index, extra)
+        setting = self.indexes[index]
+        stale_ids = sorted(stale)
+        for start in range(0, len(stale_ids), CHUNK_SIZE):
+            self._reindex(index, stale_ids[start:start + CHUNK_SIZE],
+                          setting['get_data'], setting['func_transform'])
+        logging.info('repair "{}": reindexed {}, deleted {}'.format(
+            index, len(stale), len(extra)))
+
+    def _reindex(self, index: str, ids: List[str], get_data: Callable,
+                 func_transform: Callable) -> None:
+        data = get_data(ids)
+        if data:
+            self.es.set_bulk(index, func_transform(data).values())
@@ -0,0 +1,26 @@
+import argparse
+import logging
+from logging import config
+
+from config import LOG_CONFIG, elastic_index
+from utils.elastic_db import ELFilm
+from utils.postgres_db import PGFilmWork
+from utils.verifier import ConsistencyVerifier
+
+config.dictConfig(LOG_CONFIG)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Сверка postgres и elasticsearch')
+    parser.add_argument('indexes', nargs='*', choices=list(elastic_index),
+                        default=list(elastic_index))
+    parser.add_argument('--repair', action='store_true',
+                        help='переиндексировать и удалить расхождения')
+    args = parser.parse_args()
+
+    verifier = ConsistencyVerifier(PGFilmWork(), ELFilm())
+    for index in args.indexes:
+        logging.info('verify "{}" - start'.format(index))
+        verifier.verify(index, repair=args.repair)
+        logging.info('verify "{}" - success'.format(index))